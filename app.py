@@ -6,6 +6,7 @@ from flask_cors import CORS
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+from sqlite_profile import is_sqlite, sqlite_engine_options, sqlite_writer
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -19,7 +20,9 @@ db = SQLAlchemy(model_class=Base)
 # create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# PROXY_COUNT: reverse proxies in front of the app. Each appends to X-Forwarded-For, and
+# request.remote_addr (which the rate limiter keys anonymous clients on) must be the client's
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ.get('PROXY_COUNT', '1')), x_proto=1, x_host=1)
 
 # Enable CORS for all routes with credentials support (required for session cookies)
 # Explicitly allow our custom header for Telegram WebApp auth passthrough
@@ -35,10 +38,25 @@ CORS(
 
 # configure the database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///auction.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+# SQLite profile (small deployments): WAL, busy_timeout, synchronous=NORMAL and one
+# serialized writer per process (see sqlite_profile.py). SQLITE_PROFILE=0 disables it.
+app.config['SQLITE_PROFILE'] = (
+    is_sqlite(app.config["SQLALCHEMY_DATABASE_URI"])
+    and ':memory:' not in app.config["SQLALCHEMY_DATABASE_URI"]
+    and os.environ.get('SQLITE_PROFILE', '1').lower() in ('1', 'true', 'yes')
+)
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+if app.config['SQLITE_PROFILE']:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = sqlite_engine_options(
+        pool_size=int(os.environ.get('SQLITE_POOL_SIZE', '10')),
+        busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS']
+    )
+else:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
 
 # Session cookie settings (tunable via env for Telegram WebView / HTTPS)
 # When serving via HTTPS/ngrok inside Telegram, set ENABLE_CROSS_SITE_COOKIES=1
@@ -52,10 +70,73 @@ app.config['SESSION_COOKIE_SECURE'] = os.environ.get('SESSION_COOKIE_SECURE', ''
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 
+# Photo processing: target size/quality (the WebApp downscales to the same values before upload).
+# Uploads already within the target, EXIF-free and at most PHOTO_PASSTHROUGH_MAX_BPP bytes/pixel
+# are stored as-is instead of being decoded and re-encoded.
+app.config['PHOTO_MAX_DIMENSION'] = 1280
+app.config['PHOTO_QUALITY'] = 85
+app.config['PHOTO_PASSTHROUGH_MAX_BPP'] = 0.5
+
+# Photo storage: 'local' (UPLOAD_FOLDER) or 's3' (any S3-compatible service, e.g. MinIO)
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'local')
+app.config['UPLOAD_URL_PREFIX'] = '/uploads'
+app.config['S3_BUCKET'] = os.environ.get('S3_BUCKET')
+app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')
+app.config['S3_REGION'] = os.environ.get('S3_REGION')
+app.config['S3_PUBLIC_URL'] = os.environ.get('S3_PUBLIC_URL')
+# Direct (presigned) uploads: lifetime of the upload grant and max size per photo
+app.config['DIRECT_UPLOAD_EXPIRES'] = int(os.environ.get('DIRECT_UPLOAD_EXPIRES', '900'))
+app.config['DIRECT_UPLOAD_MAX_BYTES'] = int(os.environ.get('DIRECT_UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+# Resumable chunked uploads (through the app, for flaky mobile links)
+app.config['RESUMABLE_CHUNK_SIZE'] = int(os.environ.get('RESUMABLE_CHUNK_SIZE', str(256 * 1024)))
+app.config['RESUMABLE_MAX_CHUNK_SIZE'] = 4 * 1024 * 1024
+app.config['RESUMABLE_UPLOAD_TTL'] = int(os.environ.get('RESUMABLE_UPLOAD_TTL', str(24 * 3600)))
+# Local backend behind nginx: hand photo transfers to an internal location
+# (e.g. location /protected-uploads/ { internal; alias /app/static/uploads/; })
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+# Behind Apache/lighttpd: let Flask emit X-Sendfile instead
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
+# Listing pages: page size and rendered card fragment cache
+app.config['LISTINGS_PER_PAGE'] = int(os.environ.get('LISTINGS_PER_PAGE', '20'))
+app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', '1024'))
+app.config['FRAGMENT_CACHE_TTL'] = int(os.environ.get('FRAGMENT_CACHE_TTL', '60'))
+
+# Hot/cold tiering: finished listings older than this move to the archive tables (scripts/archive_listings.py)
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', '200'))
+
+# Upload GC (scripts/gc_uploads.py): unreferenced files are kept this long, since a direct
+# upload lands in storage before its ListingPhoto row; drafts older than this are purged
+app.config['GC_ORPHAN_GRACE_HOURS'] = int(os.environ.get('GC_ORPHAN_GRACE_HOURS', '24'))
+app.config['GC_DRAFT_MAX_AGE_DAYS'] = int(os.environ.get('GC_DRAFT_MAX_AGE_DAYS', '30'))
+app.config['GC_DELETE_RATE'] = float(os.environ.get('GC_DELETE_RATE', '100'))
+
+# Claim queue (allow_queue listings): how long the first in line holds the item before it passes on
+app.config['CLAIM_HOLD_SECONDS'] = int(os.environ.get('CLAIM_HOLD_SECONDS', '900'))
+
+# Listing view/impression/bid counters: accumulated per worker, flushed to daily rollups
+app.config['STATS_ENABLED'] = os.environ.get('STATS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+app.config['STATS_FLUSH_INTERVAL'] = int(os.environ.get('STATS_FLUSH_INTERVAL', '10'))
+
+# Rate limiting on write endpoints: 'memory' (per worker) or 'sqlite' (shared by workers on one host)
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+# Max photo decode/resize requests running at once per worker; extra requests get 503
+app.config['IMAGE_PROCESSING_CONCURRENCY'] = int(os.environ.get('IMAGE_PROCESSING_CONCURRENCY', '2'))
+
 # initialize the app with the extension
 db.init_app(app)
 
 with app.app_context():
+    if app.config['SQLITE_PROFILE']:
+        sqlite_writer.install(
+            db.engine,
+            session=db.session,
+            synchronous=app.config['SQLITE_SYNCHRONOUS'],
+            busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS']
+        )
+
     # Make sure to import the models here or their tables won't be created
     import models  # noqa: F401
     
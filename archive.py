@@ -0,0 +1,180 @@
+import math
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select, update
+from app import db
+from sqlite_profile import sqlite_writer
+from models import (User, Listing, ListingPhoto, Bid, Claim, ListingStatus,
+                    ArchivedListing, ArchivedListingPhoto, ArchivedBid, ArchivedClaim)
+
+# Finished listings are only ever read after this; everything else stays hot
+ARCHIVABLE_STATUSES = (ListingStatus.CLOSED, ListingStatus.SOLD, ListingStatus.ENDED)
+
+
+def _finished_at():
+    return func.coalesce(Listing.closed_at, Listing.end_time, Listing.published_at, Listing.created_at)
+
+
+def _archivable(cutoff):
+    # Keep the newest row hot: on tables created without AUTOINCREMENT, SQLite
+    # hands out max(id) + 1 and would reuse the id of an archived listing.
+    max_id = select(func.max(Listing.id)).scalar_subquery()
+    return (Listing.status.in_(ARCHIVABLE_STATUSES), _finished_at() < cutoff, Listing.id < max_id)
+
+
+def archivable_listing_ids(cutoff, limit):
+    """Ids of finished listings that ended before `cutoff`, lowest id first"""
+    return db.session.execute(
+        select(Listing.id).where(*_archivable(cutoff)).order_by(Listing.id).limit(limit)
+    ).scalars().all()
+
+
+def count_archivable_listings(cutoff):
+    return db.session.execute(select(func.count(Listing.id)).where(*_archivable(cutoff))).scalar()
+
+
+def _copy_rows(source, target, where, extra=()):
+    """INSERT INTO target (...) SELECT ... FROM source WHERE ...; `extra` adds (name, value) pairs"""
+    names = [c.name for c in source.__table__.columns] + [name for name, _ in extra]
+    columns = list(source.__table__.columns) + [value for _, value in extra]
+    db.session.execute(insert(target.__table__).from_select(names, select(*columns).where(where)))
+
+
+def _move_bids(listing_ids, bid_batch_size, pause):
+    """Move bids of `listing_ids` in chunks of at most bid_batch_size rows, one short transaction each"""
+    moved = 0
+    while True:
+        with sqlite_writer.transaction():
+            bid_ids = db.session.execute(
+                select(Bid.id).where(Bid.listing_id.in_(listing_ids)).order_by(Bid.id).limit(bid_batch_size)
+            ).scalars().all()
+            if not bid_ids:
+                db.session.rollback()
+                return moved
+            _copy_rows(Bid, ArchivedBid, Bid.id.in_(bid_ids))
+            db.session.execute(delete(Bid).where(Bid.id.in_(bid_ids)))
+            db.session.commit()
+        moved += len(bid_ids)
+        if pause:
+            time.sleep(pause)
+
+
+def fully_archived():
+    """Filter for ArchivedListing rows whose hot row is gone. While archive_listings()
+    moves a listing's bids it is in both tables; readers combining the two show the hot one."""
+    return ~select(Listing.id).where(Listing.id == ArchivedListing.id).exists()
+
+
+def archive_listings(listing_ids, bid_batch_size=5000, pause=0):
+    """Move the given listings with their bids, photos and claims into the archive tables.
+
+    The archived listing rows are written first so the archived bids can reference
+    them; bids then move in bounded chunks, and the hot listing row (refreshed into
+    its archived copy), photos and claims go last in one transaction. If the job
+    stops in between, the hot listing still serves reads (showing only its remaining
+    bids) and the next run picks it up again.
+    """
+    # Each write transaction below must start fresh (see SQLiteWriter.transaction)
+    db.session.rollback()
+    archived_at = datetime.utcnow()
+    with sqlite_writer.transaction():
+        # Listings left half-moved by an interrupted run already have their archived row
+        _copy_rows(Listing, ArchivedListing, Listing.id.in_(listing_ids) & ~Listing.id.in_(select(ArchivedListing.id)),
+                   extra=[('archived_at', literal(archived_at))])
+        db.session.commit()
+
+    bids = _move_bids(listing_ids, bid_batch_size, pause)
+
+    with sqlite_writer.transaction():
+        seller_ids = db.session.execute(
+            select(Listing.seller_id).where(Listing.id.in_(listing_ids)).distinct()
+        ).scalars().all()
+        # The hot row may have changed since it was copied
+        db.session.execute(
+            update(ArchivedListing.__table__)
+            .where(ArchivedListing.__table__.c.id.in_(listing_ids))
+            .values({
+                column.name: select(column).where(Listing.id == ArchivedListing.__table__.c.id).scalar_subquery()
+                for column in Listing.__table__.columns if column.name != 'id'
+            })
+        )
+        _copy_rows(ListingPhoto, ArchivedListingPhoto, ListingPhoto.listing_id.in_(listing_ids))
+        _copy_rows(Claim, ArchivedClaim, Claim.listing_id.in_(listing_ids))
+        db.session.execute(delete(ListingPhoto).where(ListingPhoto.listing_id.in_(listing_ids)))
+        # Explicitly, rather than by ON DELETE CASCADE, which SQLite only runs with foreign_keys on
+        db.session.execute(delete(Claim).where(Claim.listing_id.in_(listing_ids)))
+        db.session.execute(delete(Listing).where(Listing.id.in_(listing_ids)))
+        # Core deletes skip the ORM flush hook; invalidate the sellers' cached cards here
+        if seller_ids:
+            db.session.execute(
+                User.__table__.update()
+                .where(User.__table__.c.id.in_(seller_ids))
+                .values(listings_version=User.__table__.c.listings_version + 1)
+            )
+        db.session.commit()
+    return bids
+
+
+def archive_finished_listings(older_than_days, batch_size=200, bid_batch_size=5000, pause=0.05,
+                              max_batches=None, log=None):
+    """Archive finished listings older than `older_than_days` in batches of `batch_size`.
+    Sleeps `pause` seconds between transactions so the hot tables are never locked for long.
+    Returns (listings, bids) moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    listings = bids = batches = 0
+    while max_batches is None or batches < max_batches:
+        listing_ids = archivable_listing_ids(cutoff, batch_size)
+        if not listing_ids:
+            break
+        bids += archive_listings(listing_ids, bid_batch_size, pause)
+        listings += len(listing_ids)
+        batches += 1
+        if log:
+            log(f"archived {listings} listings, {bids} bids")
+        if pause:
+            time.sleep(pause)
+    return listings, bids
+
+
+class ChainedPagination:
+    """Pagination over several queries shown one after another (hot rows, then archived).
+    Exposes the attributes the templates use from Flask-SQLAlchemy's Pagination.
+    """
+
+    def __init__(self, queries, page, per_page):
+        self.page = page
+        self.per_page = per_page
+        counts = [query.order_by(None).count() for query in queries]
+        self.total = sum(counts)
+        self.items = []
+
+        offset = (page - 1) * per_page
+        for query, count in zip(queries, counts):
+            if len(self.items) >= per_page:
+                break
+            if offset >= count:
+                offset -= count
+                continue
+            self.items.extend(query.offset(offset).limit(per_page - len(self.items)).all())
+            offset = 0
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(self.total / self.per_page)) if self.per_page else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
@@ -0,0 +1,59 @@
+import json
+import os
+from flask import url_for
+
+# Source files (relative to static/) bundled by scripts/build_assets.py
+ASSET_SOURCES = [
+    'css/telegram-theme.css',
+    'js/telegram-webapp.js',
+    'js/main.js',
+    'js/image-worker.js',
+]
+
+ASSET_DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Built files are content-hashed, so they never change under the same URL
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Precompressed variants written next to each built file, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_manifest_cache = {}
+
+
+def dist_path(app):
+    return os.path.join(app.static_folder, ASSET_DIST_DIR)
+
+
+def load_manifest(app):
+    """Map source path -> fingerprinted path; empty if assets were never built"""
+    path = os.path.join(dist_path(app), MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    _manifest_cache[path] = (mtime, manifest)
+    return manifest
+
+
+def asset_url(app, filename):
+    """URL for a static asset: the fingerprinted bundle if built, else the raw file"""
+    hashed = load_manifest(app).get(filename)
+    if hashed:
+        return url_for('serve_asset', filename=hashed)
+    return url_for('static', filename=filename)
+
+
+def pick_encoding(accept_encodings, filename, directory):
+    """Return (encoding, file name) of the best precompressed variant the client accepts.
+    `accept_encodings` is werkzeug's parsed header (request.accept_encodings)."""
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings.quality(encoding) > 0 and os.path.isfile(os.path.join(directory, filename + suffix)):
+            return encoding, filename + suffix
+    return None, filename
@@ -0,0 +1,49 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """Small thread-safe LRU cache for rendered HTML fragments.
+
+    Entries expire after `ttl` seconds so relative timestamps ("5 minutes ago")
+    don't go stale. Callers put a version number in the key (see
+    User.listings_version) so that a change made by any worker invalidates the
+    entry everywhere, even though each worker keeps its own copy.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_render(self, key, render):
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
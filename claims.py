@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from models import Claim, ClaimStatus, ListingStatus, SaleMode
+
+# Sale modes where the first person in line simply gets the item
+CLAIMABLE_MODES = (SaleMode.FREE, SaleMode.FIXED_PRICE)
+
+OPEN_STATUSES = (ClaimStatus.WAITING, ClaimStatus.HOLDING)
+
+
+class ClaimError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _hold_until(now):
+    return now + timedelta(seconds=app.config['CLAIM_HOLD_SECONDS'])
+
+
+def _commit_promotion(statement):
+    """Run a promotion UPDATE in its own transaction. Losing the race for the
+    single-holder index just means someone else was promoted first."""
+    try:
+        db.session.execute(statement)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+
+def promote_next(listing_id, now=None):
+    """Make the oldest waiting claim the holder unless the listing already has one.
+    One index seek plus one row update, however long the waitlist is.
+    """
+    now = now or datetime.utcnow()
+    has_holder = select(Claim.id).where(
+        Claim.listing_id == listing_id, Claim.status == ClaimStatus.HOLDING
+    ).exists()
+    # Cheap read first: under a flash crowd almost every call finds a holder and
+    # then never needs the write lock
+    if db.session.execute(select(has_holder)).scalar():
+        db.session.rollback()
+        return
+    next_id = select(func.min(Claim.id)).where(
+        Claim.listing_id == listing_id, Claim.status == ClaimStatus.WAITING
+    ).scalar_subquery()
+    _commit_promotion(
+        update(Claim)
+        .where(Claim.id == next_id, ~has_holder)
+        .values(status=ClaimStatus.HOLDING, expires_at=_hold_until(now))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def expire_lapsed_hold(listing_id, now=None):
+    """Expire the holder if their time ran out and hand the item to the next in line.
+    Compare-and-set, so concurrent callers expire (and promote) at most once.
+    """
+    now = now or datetime.utcnow()
+    lapsed = (Claim.listing_id == listing_id, Claim.status == ClaimStatus.HOLDING, Claim.expires_at < now)
+    if not db.session.execute(select(select(Claim.id).where(*lapsed).exists())).scalar():
+        db.session.rollback()
+        return
+    result = db.session.execute(
+        update(Claim).where(*lapsed).values(status=ClaimStatus.EXPIRED)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        promote_next(listing_id, now)
+
+
+def claim_status(claim):
+    """Public view of a claim, including how many people are ahead of it"""
+    ahead = 0
+    if claim.status == ClaimStatus.WAITING:
+        ahead = db.session.execute(
+            select(func.count(Claim.id)).where(
+                Claim.listing_id == claim.listing_id,
+                Claim.status.in_(OPEN_STATUSES),
+                Claim.id < claim.id
+            )
+        ).scalar()
+    return {
+        'claim_id': claim.id,
+        'listing_id': claim.listing_id,
+        'status': claim.status.value,
+        'ahead': ahead,
+        'expires_at': claim.expires_at.isoformat() if claim.expires_at else None,
+    }
+
+
+def get_claim(listing_id, user_id):
+    return Claim.query.filter_by(listing_id=listing_id, user_id=user_id).first()
+
+
+def claim_listing(listing, user_id):
+    """Join the queue for `listing`; the first claimant becomes the holder at once.
+    Each claim is a single-row INSERT (no shared counter row), so thousands of
+    concurrent claims never wait on each other's locks. Idempotent per user.
+    """
+    if not listing.allow_queue or listing.sale_mode not in CLAIMABLE_MODES:
+        raise ClaimError('This listing does not take claims')
+    if listing.status != ListingStatus.ACTIVE:
+        raise ClaimError('Listing is not active')
+    if listing.seller_id == user_id:
+        raise ClaimError('Cannot claim your own listing')
+
+    listing_id = listing.id
+    expire_lapsed_hold(listing_id)
+    try:
+        db.session.add(Claim(listing_id=listing_id, user_id=user_id))
+        db.session.commit()
+    except IntegrityError:
+        # Already in line (or gave up the claim earlier); report the existing one
+        db.session.rollback()
+        claim = get_claim(listing_id, user_id)
+        if claim.status not in OPEN_STATUSES:
+            raise ClaimError(f'Your claim was {claim.status.value}', 409)
+        return claim
+    promote_next(listing_id)
+    return get_claim(listing_id, user_id)
+
+
+def release_claim(listing_id, user_id):
+    """Leave the queue; if the user was holding, the next in line is promoted"""
+    now = datetime.utcnow()
+    claim = get_claim(listing_id, user_id)
+    if claim is None or claim.status not in OPEN_STATUSES:
+        raise ClaimError('No open claim', 404)
+    was_holding = claim.status == ClaimStatus.HOLDING
+    result = db.session.execute(
+        update(Claim)
+        .where(Claim.id == claim.id, Claim.status == claim.status)
+        .values(status=ClaimStatus.RELEASED)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount and was_holding:
+        promote_next(listing_id, now)
+    elif not result.rowcount:
+        # Promoted or expired in the meantime; try again with the fresh state
+        return release_claim(listing_id, user_id)
+
+
+def complete_claim(listing):
+    """Seller confirms the handover to the current holder: listing becomes SOLD and
+    everyone still waiting is released. Returns the completed claim."""
+    expire_lapsed_hold(listing.id)
+    holder = Claim.query.filter_by(listing_id=listing.id, status=ClaimStatus.HOLDING).first()
+    if holder is None:
+        raise ClaimError('Nobody is holding this listing', 409)
+
+    result = db.session.execute(
+        update(Claim)
+        .where(Claim.id == holder.id, Claim.status == ClaimStatus.HOLDING)
+        .values(status=ClaimStatus.COMPLETED)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        # Released or expired since we looked
+        db.session.rollback()
+        raise ClaimError('The claim changed, try again', 409)
+    db.session.execute(
+        update(Claim)
+        .where(Claim.listing_id == listing.id, Claim.status == ClaimStatus.WAITING)
+        .values(status=ClaimStatus.RELEASED)
+        .execution_options(synchronize_session=False)
+    )
+    listing.status = ListingStatus.SOLD
+    listing.winner_id = holder.user_id
+    listing.closed_at = datetime.utcnow()
+    db.session.commit()
+    return holder
+
+
+def queue_length(listing_id):
+    """Open claims (holder + waiting) on a listing"""
+    return db.session.execute(
+        select(func.count(Claim.id)).where(Claim.listing_id == listing_id, Claim.status.in_(OPEN_STATUSES))
+    ).scalar()
@@ -0,0 +1,202 @@
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import false, or_, select, true, union_all
+from app import db
+from models import Listing, ListingPhoto, Bid, ArchivedListing, ArchivedListingPhoto, ArchivedBid
+from archive import fully_archived
+from storage import photo_url
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Flat record layout shared by both formats. Listing records are followed by their
+# bids; `cursor` on any record resumes the export right after it.
+CSV_COLUMNS = (
+    'type', 'cursor', 'listing_id', 'title', 'status', 'sale_mode', 'price_minor',
+    'created_at', 'published_at', 'end_time', 'closed_at', 'winner_id', 'archived', 'photo_urls',
+    'bid_id', 'amount_minor', 'bidder_id', 'is_private', 'message',
+)
+
+LISTING_BATCH = 200
+BID_YIELD_PER = 1000
+# Bytes of encoded output gathered before handing a chunk to the response / compressor
+CHUNK_SIZE = 64 * 1024
+
+
+class ExportCursorError(ValueError):
+    pass
+
+
+def make_cursor(listing_id, bid_id=0):
+    return f"{listing_id}.{bid_id}"
+
+
+def parse_cursor(raw):
+    """(listing_id, bid_id) from a cursor string; (0, 0) starts from the beginning"""
+    if not raw:
+        return 0, 0
+    listing_part, _, bid_part = raw.partition('.')
+    try:
+        listing_id, bid_id = int(listing_part), int(bid_part or 0)
+    except ValueError:
+        raise ExportCursorError('Invalid cursor')
+    if listing_id < 0 or bid_id < 0:
+        raise ExportCursorError('Invalid cursor')
+    return listing_id, bid_id
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _listing_batch(seller_id, after_id, include_current):
+    """Next LISTING_BATCH listings (hot and archived, which share the id space) by id"""
+    def part(model, archived):
+        position = model.id >= after_id if include_current else model.id > after_id
+        return select(
+            model.id, model.title, model.status, model.sale_mode, model.effective_price_minor,
+            model.created_at, model.published_at, model.end_time, model.closed_at, model.winner_id,
+            (true() if archived else false()).label('archived')
+        ).where(model.seller_id == seller_id, position, *([fully_archived()] if archived else []))
+
+    both = union_all(part(Listing, False), part(ArchivedListing, True)).subquery()
+    return db.session.execute(select(both).order_by(both.c.id).limit(LISTING_BATCH)).all()
+
+
+def _photos(listing_ids):
+    both = union_all(*(
+        select(model.listing_id, model.filename, model.order).where(model.listing_id.in_(listing_ids))
+        for model in (ListingPhoto, ArchivedListingPhoto)
+    )).subquery()
+    rows = db.session.execute(select(both).order_by(both.c.listing_id, both.c.order))
+    result = {}
+    for row in rows:
+        result.setdefault(row.listing_id, []).append(photo_url(row.filename))
+    return result
+
+
+def _bids(listing_ids, resume_listing_id, resume_bid_id):
+    """Stream bids of `listing_ids` ordered by (listing, bid id) without buffering them"""
+    def part(model):
+        return select(
+            model.listing_id, model.id, model.amount_minor, model.bidder_id, model.is_private,
+            model.message, model.created_at
+        ).where(
+            model.listing_id.in_(listing_ids),
+            or_(model.listing_id != resume_listing_id, model.id > resume_bid_id)
+        )
+
+    both = union_all(part(Bid), part(ArchivedBid)).subquery()
+    return db.session.execute(
+        select(both).order_by(both.c.listing_id, both.c.id).execution_options(yield_per=BID_YIELD_PER)
+    )
+
+
+def iter_export_records(seller_id, cursor=None):
+    """Yield listing and bid records (dicts) for a seller, oldest listing first.
+    Holds at most one batch of listing rows in memory; bids are streamed.
+    """
+    after_listing_id, after_bid_id = parse_cursor(cursor)
+    # A cursor pointing into a listing resumes with the rest of its bids
+    include_current = after_listing_id > 0
+    while True:
+        listings = _listing_batch(seller_id, after_listing_id, include_current)
+        if not listings:
+            return
+        listing_ids = [row.id for row in listings]
+        photos = _photos(listing_ids)
+        bids = iter(_bids(listing_ids, after_listing_id, after_bid_id if include_current else 0))
+        pending_bid = next(bids, None)
+
+        for row in listings:
+            if not (include_current and row.id == after_listing_id):
+                yield {
+                    'type': 'listing',
+                    'cursor': make_cursor(row.id),
+                    'listing_id': row.id,
+                    'title': row.title,
+                    'status': row.status.value if row.status else None,
+                    'sale_mode': row.sale_mode.value,
+                    'price_minor': row.effective_price_minor,
+                    'created_at': _iso(row.created_at),
+                    'published_at': _iso(row.published_at),
+                    'end_time': _iso(row.end_time),
+                    'closed_at': _iso(row.closed_at),
+                    'winner_id': row.winner_id,
+                    'archived': bool(row.archived),
+                    'photo_urls': photos.get(row.id, []),
+                }
+            while pending_bid is not None and pending_bid.listing_id == row.id:
+                yield {
+                    'type': 'bid',
+                    'cursor': make_cursor(row.id, pending_bid.id),
+                    'listing_id': row.id,
+                    'bid_id': pending_bid.id,
+                    'amount_minor': pending_bid.amount_minor,
+                    'bidder_id': pending_bid.bidder_id,
+                    'is_private': bool(pending_bid.is_private),
+                    'message': pending_bid.message,
+                    'created_at': _iso(pending_bid.created_at),
+                }
+                pending_bid = next(bids, None)
+
+        after_listing_id = listings[-1].id
+        after_bid_id = 0
+        include_current = False
+        # Don't pin one read transaction for the whole (possibly hours-long) download
+        db.session.rollback()
+
+
+def _chunked(pieces):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def encode_ndjson(records):
+    return _chunked(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+
+def encode_csv(records, header=True):
+    def lines():
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        if header:
+            writer.writeheader()
+        for record in records:
+            if record['type'] == 'listing':
+                record = dict(record, photo_urls=' '.join(record['photo_urls']))
+            writer.writerow(record)
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        if out.tell():
+            yield out.getvalue()
+    return _chunked(lines())
+
+
+def encode_export(records, fmt, header=True):
+    """Encoded byte chunks; `header` only matters for CSV (skip it when resuming)"""
+    if fmt == 'csv':
+        return encode_csv(records, header)
+    return encode_ndjson(records)
+
+
+def gzip_chunks(chunks):
+    """Compress a byte-chunk stream on the fly into a single gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
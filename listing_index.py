@@ -0,0 +1,311 @@
+import re
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app import db
+from models import Listing, ListingPhoto, ListingStatus, SaleMode
+
+# Words are runs of letters/digits in any script ("iPhone 13", "диван-кровать")
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Posting lists are keyed by word prefixes of up to this many characters; longer query
+# tokens are narrowed by checking the candidate's title.
+PREFIX_KEY_LEN = 4
+MAX_QUERY_TOKENS = 5
+# Key of the posting list holding every listing (serves the empty query)
+ALL = ''
+
+
+def tokenize(text):
+    return [word.casefold() for word in _WORD_RE.findall(text or '')]
+
+
+def _normalize(title):
+    # " word word ...": `" " + token in normalized` tests for a word starting with token
+    return ' ' + ' '.join(tokenize(title))
+
+
+def _prefix_keys(words):
+    keys = {ALL}
+    for word in words:
+        for n in range(1, min(len(word), PREFIX_KEY_LEN) + 1):
+            keys.add(word[:n])
+    return keys
+
+
+def _add_posting(postings, listing_id):
+    # Ids are kept ascending; new listings have the highest ids, so this is nearly always an append
+    if not postings or postings[-1] < listing_id:
+        postings.append(listing_id)
+        return True
+    i = bisect_left(postings, listing_id)
+    if i == len(postings) or postings[i] != listing_id:
+        postings.insert(i, listing_id)
+        return True
+    return False
+
+
+def _bitmap(postings):
+    bits = bytearray((postings[-1] >> 3) + 1)
+    for listing_id in postings:
+        bits[listing_id >> 3] |= 1 << (listing_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _iter_bits_desc(mask, chunk=256):
+    """Set bit positions of `mask`, highest first"""
+    bits = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    end = len(bits)
+    while end > 0:
+        start = max(0, end - chunk)
+        # Skip all-zero stretches without looking at single bytes
+        if bits.count(0, start, end) != end - start:
+            for i in range(end - 1, start - 1, -1):
+                byte = bits[i]
+                if byte:
+                    for bit in range(7, -1, -1):
+                        if byte >> bit & 1:
+                            yield (i << 3) | bit
+        end = start
+
+
+class ListingSearchIndex:
+    """In-memory prefix index over listing titles for as-you-type search.
+
+    Every word of a title contributes its 1..PREFIX_KEY_LEN character prefixes as
+    keys; each key maps to an ascending list of listing ids. Keys common enough
+    that a bitmap (a Python int, one bit per id) is no bigger than their list also
+    get one, so a multi-word query intersects its common words with a single
+    big-int AND instead of walking long lists. Candidates are then taken newest
+    first (from the shortest list, or from the top bits of the intersection) and
+    kept if every token is the start of some word of the title, stopping as soon
+    as the requested page is full.
+
+    Removals are lazy (the id disappears from `docs` and is skipped) and the
+    postings are rebuilt once stale entries pile up. `docs` maps listing id ->
+    payload; the payload's first item must be the title.
+    """
+
+    # Upper bound on candidates examined per query, to cap worst-case latency: a rare
+    # long word whose first PREFIX_KEY_LEN letters are common ("blacuc") is only
+    # looked for among the newest MAX_SCAN listings starting with those letters
+    MAX_SCAN = 10_000
+    # A key gets a bitmap once its list holds more than one id per BITMAP_DENSITY ids
+    BITMAP_DENSITY = 64
+
+    def __init__(self):
+        self.docs = {}
+        self._normalized = {}
+        self._postings = {}
+        self._bitmaps = {}
+        self._max_id = 0
+        self._entries = 0
+        self._stale = 0
+        # Ids whose title changed (or that were removed) since the last rebuild: their
+        # old keys still list them
+        self._retitled = set()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def upsert(self, listing_id, payload):
+        """Add or update a listing. Postings change only if the title did."""
+        old = self.docs.get(listing_id)
+        self.docs[listing_id] = payload
+        if old is not None and old[0] == payload[0]:
+            return
+        if old is not None:
+            self._stale += len(_prefix_keys(self._normalized[listing_id].split()))
+            self._retitled.add(listing_id)
+        normalized = self._normalized[listing_id] = _normalize(payload[0])
+        self._max_id = max(self._max_id, listing_id)
+        for key in _prefix_keys(normalized.split()):
+            postings = self._postings.get(key)
+            if postings is None:
+                postings = self._postings[key] = []
+            if not _add_posting(postings, listing_id):
+                continue
+            self._entries += 1
+            if key in self._bitmaps:
+                self._bitmaps[key] |= 1 << listing_id
+            elif len(postings) * self.BITMAP_DENSITY > self._max_id:
+                self._bitmaps[key] = _bitmap(postings)
+        self._maybe_compact()
+
+    def bulk_load(self, items):
+        """Replace the contents with (listing_id, payload) pairs; much faster than upserting one by one"""
+        self.docs = dict(items)
+        self._normalized = {listing_id: _normalize(payload[0]) for listing_id, payload in self.docs.items()}
+        self.rebuild()
+
+    def remove(self, listing_id):
+        if self.docs.pop(listing_id, None) is not None:
+            self._stale += len(_prefix_keys(self._normalized.pop(listing_id).split()))
+            # Its postings stay until the next rebuild; if it comes back (e.g. a closed
+            # listing reopened under a new title) the old keys must not match it
+            self._retitled.add(listing_id)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._stale > 10_000 and self._stale * 4 > self._entries:
+            self.rebuild()
+
+    def rebuild(self):
+        """Recreate all postings from the live documents (drops stale entries)"""
+        postings = {}
+        entries = 0
+        for listing_id in sorted(self.docs):
+            for key in _prefix_keys(self._normalized[listing_id].split()):
+                postings.setdefault(key, []).append(listing_id)
+                entries += 1
+        max_id = max(self.docs, default=0)
+        self._bitmaps = {key: _bitmap(ids) for key, ids in postings.items()
+                         if len(ids) * self.BITMAP_DENSITY > max_id}
+        self._postings, self._max_id, self._entries, self._stale = postings, max_id, entries, 0
+        self._retitled = set()
+
+    def _candidates(self, keys):
+        """Ids possibly matching all `keys`, newest first"""
+        lists = [self._postings.get(key) for key in keys]
+        if not all(lists):
+            return iter(())
+        if len(keys) == 1:
+            return reversed(lists[0])
+        sparse = [ids for key, ids in zip(keys, lists) if key not in self._bitmaps]
+        mask = None
+        for key in keys:
+            if key in self._bitmaps:
+                mask = self._bitmaps[key] if mask is None else mask & self._bitmaps[key]
+        if mask is None:
+            return reversed(min(sparse, key=len))
+        if not sparse:
+            return _iter_bits_desc(mask)
+        bits = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+        size = len(bits) << 3
+        return (listing_id for listing_id in reversed(min(sparse, key=len))
+                if listing_id < size and bits[listing_id >> 3] >> (listing_id & 7) & 1)
+
+    def search(self, query, offset=0, limit=20, accept=None):
+        """Newest-first matches for `query`: returns (ids, has_more).
+        `accept(payload)` can drop otherwise matching listings (e.g. ended auctions).
+        An empty query lists the newest listings.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+        keys = list(dict.fromkeys(token[:PREFIX_KEY_LEN] for token in tokens)) or [ALL]
+        # Tokens equal to their key are fully answered by the postings (unless retitled)
+        to_check = [' ' + token for token in tokens if len(token) > PREFIX_KEY_LEN]
+        everything = [' ' + token for token in tokens]
+        retitled = self._retitled
+
+        wanted = offset + limit + 1
+        matches = []
+        docs, normalized = self.docs, self._normalized
+        for scanned, listing_id in enumerate(self._candidates(keys)):
+            if scanned >= self.MAX_SCAN:
+                break
+            payload = docs.get(listing_id)
+            if payload is None:
+                continue
+            if to_check or listing_id in retitled:
+                title = normalized[listing_id]
+                if not all(token in title for token in (everything if listing_id in retitled else to_check)):
+                    continue
+            if accept is not None and not accept(payload):
+                continue
+            matches.append(listing_id)
+            if len(matches) >= wanted:
+                break
+        return matches[offset:offset + limit], len(matches) > offset + limit
+
+IndexedListing = namedtuple('IndexedListing', 'title sale_mode price_minor end_time')
+
+
+def is_open(listing):
+    """Auctions stay ACTIVE after end_time until someone closes them; don't offer those"""
+    return not (listing.sale_mode == SaleMode.AUCTION and listing.end_time
+                and listing.end_time <= datetime.utcnow())
+
+
+class ActiveListingIndex(ListingSearchIndex):
+    """ListingSearchIndex of ACTIVE listings, kept in sync with the database.
+
+    load() reads all active listings once; refresh() then only reads rows whose
+    updated_at moved since the previous call (re-reading a few seconds back, since
+    a row's timestamp is taken before its transaction commits).
+    """
+
+    OVERLAP = timedelta(seconds=5)
+    BATCH = 10_000
+
+    def __init__(self):
+        super().__init__()
+        self._since = None
+
+    def _columns(self):
+        return select(Listing.id, Listing.title, Listing.status, Listing.sale_mode,
+                      Listing.effective_price_minor, Listing.end_time, Listing.updated_at)
+
+    def _apply(self, row):
+        if row.status == ListingStatus.ACTIVE:
+            self.upsert(row.id, IndexedListing(row.title, row.sale_mode, row.effective_price_minor, row.end_time))
+        else:
+            self.remove(row.id)
+        if row.updated_at and row.updated_at > self._since:
+            self._since = row.updated_at
+
+    def load(self):
+        """(Re)build the index from scratch; returns the number of indexed listings"""
+        # Rows from before updated_at existed have none; start watching changes from now
+        since = db.session.execute(select(func.max(Listing.updated_at))).scalar() or datetime.utcnow()
+        rows = db.session.execute(
+            self._columns().where(Listing.status == ListingStatus.ACTIVE)
+            .order_by(Listing.id).execution_options(yield_per=self.BATCH)
+        )
+        self.bulk_load(
+            (row.id, IndexedListing(row.title, row.sale_mode, row.effective_price_minor, row.end_time))
+            for row in rows
+        )
+        db.session.rollback()
+        # Anything changed while loading is picked up by the next refresh()
+        self._since = since
+        return len(self.docs)
+
+    def refresh(self):
+        """Apply listings changed since the last load/refresh; returns how many rows were read"""
+        if self._since is None:
+            return self.load()
+        since = self._since - self.OVERLAP
+        seen = 0
+        last = (since, 0)
+        while True:
+            # Keyset over (updated_at, id) so a burst of changes is read in bounded batches
+            rows = db.session.execute(
+                self._columns().where(
+                    (Listing.updated_at > last[0])
+                    | ((Listing.updated_at == last[0]) & (Listing.id > last[1]))
+                ).order_by(Listing.updated_at, Listing.id).limit(self.BATCH)
+            ).all()
+            for row in rows:
+                self._apply(row)
+            seen += len(rows)
+            if len(rows) < self.BATCH:
+                break
+            last = (rows[-1].updated_at, rows[-1].id)
+        db.session.rollback()
+        return seen
+
+
+def cover_photos(listing_ids):
+    """First photo key of each listing that has one"""
+    first = (select(ListingPhoto.listing_id, func.min(ListingPhoto.order).label('order'))
+             .where(ListingPhoto.listing_id.in_(listing_ids))
+             .group_by(ListingPhoto.listing_id).subquery())
+    rows = db.session.execute(
+        select(ListingPhoto.listing_id, ListingPhoto.filename)
+        .join(first, (ListingPhoto.listing_id == first.c.listing_id) & (ListingPhoto.order == first.c.order))
+    )
+    result = {}
+    for listing_id, filename in rows:
+        result.setdefault(listing_id, filename)
+    return result
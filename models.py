@@ -1,3 +1,6 @@
+from itertools import chain
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session, deferred
 from app import db
 from datetime import datetime
 from enum import Enum
@@ -15,6 +18,13 @@ class ListingStatus(Enum):
     CLOSED = "closed"
     ENDED = "ended"
 
+class ClaimStatus(Enum):
+    WAITING = "waiting"
+    HOLDING = "holding"
+    RELEASED = "released"
+    EXPIRED = "expired"
+    COMPLETED = "completed"
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     telegram_id = db.Column(db.BigInteger, unique=True, nullable=False)
@@ -22,6 +32,9 @@ class User(db.Model):
     first_name = db.Column(db.String(64), nullable=True)
     last_name = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever any of the user's listings (or their photos/bids) change;
+    # used as part of rendered fragment cache keys
+    listings_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships - specify foreign keys to avoid ambiguity
     listings = db.relationship('Listing', foreign_keys='Listing.seller_id', backref='seller', lazy=True)
@@ -30,17 +43,20 @@ class User(db.Model):
 class Listing(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=True)
+    # Potentially large; loaded only when accessed (list pages never need it)
+    description = deferred(db.Column(db.Text, nullable=True))
     category = db.Column(db.String(100), nullable=True)
     condition = db.Column(db.String(50), nullable=True)
     
-    # Sale mode and pricing
+    # Sale mode and pricing (integer minor units: agorot/cents)
     sale_mode = db.Column(db.Enum(SaleMode), nullable=False)
-    fixed_price = db.Column(db.Numeric(10, 2), nullable=True)
-    start_price = db.Column(db.Numeric(10, 2), nullable=True)
-    min_price = db.Column(db.Numeric(10, 2), nullable=True)
-    current_price = db.Column(db.Numeric(10, 2), nullable=True)
-    bid_step = db.Column(db.Numeric(10, 2), nullable=True)
+    fixed_price_minor = db.Column(db.BigInteger, nullable=True)
+    start_price_minor = db.Column(db.BigInteger, nullable=True)
+    min_price_minor = db.Column(db.BigInteger, nullable=True)
+    current_price_minor = db.Column(db.BigInteger, nullable=True)
+    bid_step_minor = db.Column(db.BigInteger, nullable=True)
+    # Single price used for filtering/sorting regardless of sale mode
+    effective_price_minor = db.Column(db.BigInteger, nullable=True)
     
     # Flags
     is_negotiable = db.Column(db.Boolean, default=False)
@@ -53,24 +69,59 @@ class Listing(db.Model):
     published_at = db.Column(db.DateTime, nullable=True)
     end_time = db.Column(db.DateTime, nullable=True)
     closed_at = db.Column(db.DateTime, nullable=True)
+    # Bumped on every change; lets the bot's search index pick up changes incrementally
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Foreign keys
     seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     
     # Relationships
-    photos = db.relationship('ListingPhoto', backref='listing', lazy=True, cascade='all, delete-orphan')
+    photos = db.relationship('ListingPhoto', backref='listing', lazy=True, cascade='all, delete-orphan',
+                             order_by='ListingPhoto.order')
     bids = db.relationship('Bid', backref='listing', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_listing_status_effective_price', 'status', 'effective_price_minor'),
+        # Never reuse ids of archived listings (SQLite would otherwise reuse the max id)
+        {'sqlite_autoincrement': True},
+    )
+
+    is_archived = False
+
+    # Columns rendered on the seller's listing card (templates/partials/my_listings_cards.html)
+    CARD_FIELDS = (
+        'title', 'status', 'sale_mode', 'fixed_price_minor', 'current_price_minor', 'min_price_minor',
+        'is_negotiable', 'created_at', 'published_at', 'end_time', 'seller_id',
+    )
+
+    def compute_effective_price(self):
+        """Return the price that represents this listing for its sale mode"""
+        if self.sale_mode == SaleMode.FIXED_PRICE:
+            return self.fixed_price_minor
+        if self.sale_mode == SaleMode.AUCTION:
+            return self.current_price_minor
+        if self.sale_mode == SaleMode.NAME_YOUR_PRICE:
+            return self.min_price_minor
+        if self.sale_mode == SaleMode.FREE:
+            return 0
+        return None
+
+@db.event.listens_for(Listing, 'before_insert')
+@db.event.listens_for(Listing, 'before_update')
+def _sync_effective_price(mapper, connection, target):
+    target.effective_price_minor = target.compute_effective_price()
+
 class ListingPhoto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(255), nullable=False)
+    # Storage key; indexed so the upload GC can check files against it in batches
+    filename = db.Column(db.String(255), nullable=False, index=True)
     order = db.Column(db.Integer, default=0)
     listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
 
 class Bid(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    amount_minor = db.Column(db.BigInteger, nullable=False)
     message = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_private = db.Column(db.Boolean, default=False)
@@ -78,3 +129,153 @@ class Bid(db.Model):
     # Foreign keys
     listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
     bidder_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    __table_args__ = (
+        # Per-listing bid lookups (bid lists, counts, archiving) without scanning all history
+        db.Index('ix_bid_listing_created', 'listing_id', 'created_at'),
+    )
+
+# Reservation queue for allow_queue listings (see claims.py). Arrival order is the
+# primary key; at most one HOLDING claim per listing, enforced by a partial unique index.
+class Claim(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.Enum(ClaimStatus), nullable=False, default=ClaimStatus.WAITING)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set when the claim becomes the holder; the hold lapses after this
+    expires_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('listing_id', 'user_id', name='uq_claim_listing_user'),
+        # Next in line: seek (listing, WAITING) and take the lowest id
+        db.Index('ix_claim_listing_status_id', 'listing_id', 'status', 'id'),
+        db.Index('uq_claim_one_holder', 'listing_id', unique=True,
+                 sqlite_where=db.text("status = 'HOLDING'"),
+                 postgresql_where=db.text("status = 'HOLDING'")),
+    )
+
+# Daily rollups written by stats.StatsCounter; the seller stats endpoint reads only these.
+# No foreign key to listing: rows outlive archiving and deletion of the listing.
+class ListingDailyStats(db.Model):
+    listing_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Date, primary_key=True)
+    seller_id = db.Column(db.Integer, nullable=False)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    impressions = db.Column(db.Integer, nullable=False, default=0)
+    bids = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_listing_daily_stats_seller_day', 'seller_id', 'day'),
+    )
+
+class SellerDailyStats(db.Model):
+    seller_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    impressions = db.Column(db.Integer, nullable=False, default=0)
+    bids = db.Column(db.Integer, nullable=False, default=0)
+
+# Cold storage for finished listings (see archive.py). Same column names as the hot
+# tables so the same queries, serializers and templates work on both; listing ids
+# are kept, bids/photos get their own key and keep the original id as a plain column.
+class ArchivedListing(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = deferred(db.Column(db.Text, nullable=True))
+    category = db.Column(db.String(100), nullable=True)
+    condition = db.Column(db.String(50), nullable=True)
+
+    sale_mode = db.Column(db.Enum(SaleMode), nullable=False)
+    fixed_price_minor = db.Column(db.BigInteger, nullable=True)
+    start_price_minor = db.Column(db.BigInteger, nullable=True)
+    min_price_minor = db.Column(db.BigInteger, nullable=True)
+    current_price_minor = db.Column(db.BigInteger, nullable=True)
+    bid_step_minor = db.Column(db.BigInteger, nullable=True)
+    effective_price_minor = db.Column(db.BigInteger, nullable=True)
+
+    is_negotiable = db.Column(db.Boolean, default=False)
+    allow_queue = db.Column(db.Boolean, default=False)
+    private_offers = db.Column(db.Boolean, default=False)
+
+    status = db.Column(db.Enum(ListingStatus), nullable=False)
+    created_at = db.Column(db.DateTime)
+    published_at = db.Column(db.DateTime, nullable=True)
+    end_time = db.Column(db.DateTime, nullable=True)
+    closed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    photos = db.relationship('ArchivedListingPhoto', lazy=True, viewonly=True,
+                             order_by='ArchivedListingPhoto.order')
+
+    is_archived = True
+
+class ArchivedListingPhoto(db.Model):
+    archive_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(255), nullable=False, index=True)
+    order = db.Column(db.Integer, default=0)
+    listing_id = db.Column(db.Integer, db.ForeignKey('archived_listing.id'), nullable=False, index=True)
+
+class ArchivedBid(db.Model):
+    archive_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)
+    amount_minor = db.Column(db.BigInteger, nullable=False)
+    message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+    is_private = db.Column(db.Boolean, default=False)
+
+    listing_id = db.Column(db.Integer, db.ForeignKey('archived_listing.id'), nullable=False, index=True)
+    bidder_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+class ArchivedClaim(db.Model):
+    archive_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)
+    listing_id = db.Column(db.Integer, db.ForeignKey('archived_listing.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.Enum(ClaimStatus), nullable=False)
+    created_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, nullable=True)
+
+@db.event.listens_for(Session, 'after_flush')
+def _bump_listings_version(session, flush_context):
+    """Invalidate cached seller cards when something they render changes.
+
+    Only listing rows added, deleted or changed in a CARD_FIELDS column, and photo
+    changes, count. Bids are left out so the bid path doesn't also write the
+    seller's user row: the bid count on a card catches up when the fragment
+    expires (FRAGMENT_CACHE_TTL), and an auction bid changes current_price_minor anyway.
+    """
+    seller_ids = set()
+    listing_ids = set()
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, Listing):
+            seller_ids.add(obj.seller_id)
+        elif isinstance(obj, ListingPhoto):
+            listing_ids.add(obj.listing_id)
+    for obj in session.dirty:
+        if isinstance(obj, Listing):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in Listing.CARD_FIELDS):
+                seller_ids.add(obj.seller_id)
+        elif isinstance(obj, ListingPhoto) and session.is_modified(obj):
+            listing_ids.add(obj.listing_id)
+    if not seller_ids and not listing_ids:
+        return
+
+    connection = session.connection()
+    if listing_ids:
+        seller_ids.update(connection.execute(
+            select(Listing.seller_id).where(Listing.id.in_(listing_ids))
+        ).scalars())
+    seller_ids.discard(None)
+    if seller_ids:
+        connection.execute(
+            User.__table__.update()
+            .where(User.__table__.c.id.in_(seller_ids))
+            .values(listings_version=User.__table__.c.listings_version + 1)
+        )
@@ -0,0 +1,224 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+from flask import jsonify, request, session
+
+# burst: bucket capacity; rate: tokens refilled per second
+Limit = namedtuple('Limit', ['scope', 'burst', 'rate'])
+
+
+class MemoryBuckets:
+    """Token buckets in process memory. Exact per worker; use SQLiteBuckets to share
+    limits between gunicorn workers on one host."""
+
+    # Sweep buckets that have refilled completely once the table grows past this,
+    # at most once per SWEEP_INTERVAL seconds (a sweep walks every key)
+    MAX_KEYS = 100_000
+    SWEEP_INTERVAL = 60
+    # Buckets idle this long have refilled for any limit we use
+    IDLE_SECONDS = 600
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def take(self, key, burst, rate, cost=1):
+        """Consume `cost` tokens; returns 0 if allowed, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (cost - tokens) / rate
+            if len(self._buckets) > self.MAX_KEYS and now - self._last_sweep >= self.SWEEP_INTERVAL:
+                self._sweep(now)
+        return wait
+
+    def refund(self, key, burst, cost=1):
+        """Give back tokens taken by a take() that turned out not to count"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, last = self._buckets[key]
+                self._buckets[key] = (min(burst, tokens + cost), last)
+
+    def _sweep(self, now):
+        # Caller holds the lock
+        self._last_sweep = now
+        stale = [k for k, (_, last) in self._buckets.items() if now - last > self.IDLE_SECONDS]
+        for key in stale:
+            del self._buckets[key]
+
+
+class SQLiteBuckets:
+    """Token buckets in a local SQLite file shared by all worker processes on the host.
+    Each take() is one short IMMEDIATE transaction on a WAL database."""
+
+    # Each process deletes idle buckets at most this often, from take()
+    PURGE_INTERVAL = 600
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, burst, rate, cost=1):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, ts FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, last = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - last) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+            conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, ts) VALUES (?, ?, ?)', (key, tokens, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self.maybe_purge(now)
+        return wait
+
+    def refund(self, key, burst, cost=1):
+        self._connect().execute('UPDATE bucket SET tokens = MIN(?, tokens + ?) WHERE key = ?', (burst, cost, key))
+
+    def purge(self, older_than=3600):
+        self._connect().execute('DELETE FROM bucket WHERE ts < ?', (time.time() - older_than,))
+
+    def maybe_purge(self, now):
+        """purge() at most once per PURGE_INTERVAL seconds per process"""
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            self.purge()
+        except sqlite3.OperationalError:
+            pass  # busy; the next interval tries again
+
+
+class ConcurrencyLimit:
+    """Non-blocking bound on in-flight requests for an expensive endpoint (per process)"""
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def try_acquire(self):
+        return self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.backend = MemoryBuckets()
+        self._identify = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        if app.config.get('RATE_LIMIT_BACKEND') == 'sqlite':
+            self.backend = SQLiteBuckets(os.path.join(app.instance_path, 'ratelimit.sqlite3'))
+
+    def user_loader(self, identify):
+        """Decorator: register `identify()`, called before a 'user' bucket is picked when
+        the request has no session yet, to sign the user in some other way (e.g. from a
+        header). Otherwise such users all share their IP's bucket."""
+        self._identify = identify
+        return identify
+
+    def scope_key(self, scope):
+        if scope == 'user':
+            if 'user_id' not in session and self._identify is not None:
+                self._identify()
+            user_id = session.get('user_id')
+            return f"u{user_id}" if user_id else f"ip{request.remote_addr}"
+        if scope == 'listing':
+            return f"l{request.view_args.get('listing_id')}"
+        if scope == 'ip':
+            return f"ip{request.remote_addr}"
+        raise ValueError(f"Unknown rate limit scope: {scope}")
+
+    def check(self, name, limits):
+        """Seconds to wait before retrying, or 0 if every bucket admitted the request.
+        A rejected request costs nothing: tokens taken from earlier buckets are refunded."""
+        taken = []
+        for limit in limits:
+            key = f"{name}:{limit.scope}:{self.scope_key(limit.scope)}"
+            wait = self.backend.take(key, limit.burst, limit.rate)
+            if wait:
+                for key, burst in taken:
+                    self.backend.refund(key, burst)
+                return wait
+            taken.append((key, limit.burst))
+        return 0.0
+
+    def limit(self, *limits):
+        """Decorator: reject with 429 + Retry-After when any bucket is empty"""
+        def decorator(view):
+            name = view.__name__
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.enabled:
+                    wait = self.check(name, limits)
+                    if wait:
+                        return _reject(429, 'Too many requests, slow down', wait)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def bounded(self, max_concurrent, retry_after=1):
+        """Decorator: shed load with 503 + Retry-After instead of queuing when
+        `max_concurrent` requests are already running in this process"""
+        def decorator(view):
+            gate = ConcurrencyLimit(max_concurrent)
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                if not gate.try_acquire():
+                    return _reject(503, 'Server busy, try again shortly', retry_after)
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    gate.release()
+            return wrapper
+        return decorator
+
+
+def _reject(status, message, retry_after):
+    response = jsonify({'error': message, 'retry_after': round(retry_after, 3)})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import secrets
+import shutil
+import time
+
+# Copy buffer for streaming request bodies into the staging file
+COPY_BUFFER = 64 * 1024
+
+_UPLOAD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class ResumableUploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ResumableUploadStore:
+    """Staging area for chunked, resumable uploads.
+
+    Each upload is a directory holding:
+      meta.json   - immutable upload metadata (owner, listing, name, type, size)
+      data.part   - the file being assembled, written in place at chunk offsets
+      ranges/     - one empty marker file "<start>-<end>" per received chunk
+
+    Chunks may arrive in any order, be retried or overlap; every chunk writes
+    disjoint or identical bytes, and marker files are created atomically, so
+    concurrent chunk requests need no locking. Nothing is buffered in memory
+    beyond COPY_BUFFER.
+    """
+
+    def __init__(self, root, max_size, max_chunk_size):
+        self.root = root
+        self.max_size = max_size
+        self.max_chunk_size = max_chunk_size
+        self._last_purge = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        if not _UPLOAD_ID_RE.match(upload_id or ''):
+            raise ResumableUploadError('Unknown upload', 404)
+        return os.path.join(self.root, upload_id)
+
+    def create(self, user_id, listing_id, filename, content_type, size):
+        if not isinstance(size, int) or size <= 0:
+            raise ResumableUploadError('size must be a positive integer')
+        if size > self.max_size:
+            raise ResumableUploadError(f'File must be at most {self.max_size} bytes', 413)
+
+        upload_id = secrets.token_urlsafe(18)
+        path = self._dir(upload_id)
+        os.makedirs(os.path.join(path, 'ranges'))
+        with open(os.path.join(path, 'data.part'), 'wb') as f:
+            f.truncate(size)
+        meta = {
+            'upload_id': upload_id,
+            'user_id': user_id,
+            'listing_id': listing_id,
+            'filename': filename,
+            'content_type': content_type,
+            'size': size,
+            'created_at': time.time(),
+        }
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return meta
+
+    def meta(self, upload_id, user_id=None):
+        path = self._dir(upload_id)
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise ResumableUploadError('Unknown upload', 404)
+        if user_id is not None and meta['user_id'] != user_id:
+            raise ResumableUploadError('Unknown upload', 404)
+        return meta
+
+    def write_chunk(self, meta, start, length, stream):
+        """Write `length` bytes from `stream` at offset `start`"""
+        size = meta['size']
+        if start < 0 or length <= 0 or start + length > size:
+            raise ResumableUploadError('Chunk outside of file bounds', 416)
+        if length > self.max_chunk_size:
+            raise ResumableUploadError(f'Chunk must be at most {self.max_chunk_size} bytes', 413)
+
+        path = self._dir(meta['upload_id'])
+        written = 0
+        try:
+            with open(os.path.join(path, 'data.part'), 'r+b') as f:
+                f.seek(start)
+                while written < length:
+                    buf = stream.read(min(COPY_BUFFER, length - written))
+                    if not buf:
+                        break
+                    f.write(buf)
+                    written += len(buf)
+        finally:
+            # Record only what actually arrived, even if the client disconnected mid-chunk
+            if written:
+                marker = os.path.join(path, 'ranges', f"{start}-{start + written}")
+                open(marker, 'a').close()
+        if written < length:
+            raise ResumableUploadError('Chunk incomplete, resume from reported offset', 400)
+        return written
+
+    def received_ranges(self, meta):
+        """Merged list of [start, end) byte ranges received so far"""
+        path = os.path.join(self._dir(meta['upload_id']), 'ranges')
+        ranges = []
+        for name in os.listdir(path):
+            start, _, end = name.partition('-')
+            ranges.append((int(start), int(end)))
+        ranges.sort()
+
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    def status(self, meta):
+        ranges = self.received_ranges(meta)
+        # Offset = end of the contiguous prefix; clients resume sequential uploads from here
+        offset = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+        received = sum(end - start for start, end in ranges)
+        return {
+            'upload_id': meta['upload_id'],
+            'size': meta['size'],
+            'offset': offset,
+            'received': received,
+            'ranges': ranges,
+            'complete': received == meta['size'],
+        }
+
+    def data_path(self, meta):
+        return os.path.join(self._dir(meta['upload_id']), 'data.part')
+
+    def discard(self, upload_id):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def purge_stale(self, max_age, dry_run=False):
+        """Remove uploads with no chunk activity for max_age seconds; returns how many"""
+        cutoff = time.time() - max_age
+        removed = 0
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                try:
+                    # ranges/ gets a new marker on every chunk, so its mtime is the last activity
+                    last_activity = os.stat(os.path.join(entry.path, 'ranges')).st_mtime
+                except FileNotFoundError:
+                    last_activity = entry.stat().st_mtime
+                if last_activity < cutoff:
+                    if not dry_run:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+        return removed
+
+    def maybe_purge_stale(self, max_age, interval=600):
+        """purge_stale() at most once per `interval` seconds per process"""
+        now = time.monotonic()
+        if now - self._last_purge >= interval:
+            self._last_purge = now
+            self.purge_stale(max_age)
@@ -1,20 +1,92 @@
 import os
 import json
+import mimetypes
+import re
 from datetime import datetime, timedelta
-from decimal import Decimal, InvalidOperation
-from flask import render_template, request, jsonify, session, redirect, url_for
-from sqlalchemy import desc, or_
+from flask import (render_template, request, jsonify, session, redirect, url_for, abort, send_from_directory,
+                   stream_with_context)
+from sqlalchemy import desc, or_, func
+from sqlalchemy.orm import selectinload
+from werkzeug.datastructures import FileStorage
 from app import app, db
-from models import User, Listing, ListingPhoto, Bid, SaleMode, ListingStatus
+from models import (User, Listing, ListingPhoto, Bid, SaleMode, ListingStatus, ArchivedListing, ArchivedBid,
+                    Claim, ClaimStatus)
 from utils import (
     verify_telegram_webapp_data, 
     parse_telegram_user_data, 
     process_uploaded_image,
+    IMAGE_HEADER_BYTES,
+    is_image_header,
+    allowed_file,
+    to_minor_units,
     format_price,
-    calculate_time_remaining
+    format_price_exact
 )
+from serializers import parse_listing_fields, select_listings, serialize_listing_rows
+from cache import FragmentCache
+from assets import ASSET_MAX_AGE, asset_url, dist_path, pick_encoding
+from storage import StorageError, get_storage, new_photo_key, photo_url, sign_upload, load_upload
+from resumable import ResumableUploadStore, ResumableUploadError
+from ratelimit import Limit, RateLimiter
+from sqlite_profile import sqlite_writer
+from stats import StatsCounter, seller_stats
+from export import EXPORT_FORMATS, ExportCursorError, encode_export, gzip_chunks, iter_export_records, parse_cursor
+from archive import ChainedPagination, fully_archived
+from claims import (ClaimError, claim_listing, claim_status, complete_claim, expire_lapsed_hold,
+                    get_claim, queue_length, release_claim)
 
+# Rendered listing cards per seller; keys carry User.listings_version so any
+# write to the seller's listings makes old entries unreachable
+fragment_cache = FragmentCache(
+    max_entries=app.config['FRAGMENT_CACHE_SIZE'],
+    ttl=app.config['FRAGMENT_CACHE_TTL']
+)
+
+# Admission control for write endpoints (token buckets + bounded image processing)
+limiter = RateLimiter(app)
+
+# Listing views/impressions/bids, coalesced in memory and flushed to the daily rollups
+stats_counter = StatsCounter(app)
+
+# Staging area for chunked, resumable photo uploads
+upload_store = ResumableUploadStore(
+    os.path.join(app.instance_path, 'upload_staging'),
+    max_size=app.config['DIRECT_UPLOAD_MAX_BYTES'],
+    max_chunk_size=app.config['RESUMABLE_MAX_CHUNK_SIZE']
+)
+
+
+def bid_counts_for(listings):
+    """Map listing id -> number of bids, one grouped query per table (hot/archived)"""
+    counts = {}
+    for model, archived in ((Bid, False), (ArchivedBid, True)):
+        ids = [listing.id for listing in listings if listing.is_archived == archived]
+        if ids:
+            counts.update(db.session.query(model.listing_id, func.count(model.id)).filter(
+                model.listing_id.in_(ids)
+            ).group_by(model.listing_id).all())
+    return counts
+
+
+def get_or_create_user(telegram_id, **fields):
+    """User with `telegram_id`, inserted with `fields` if there is none yet.
+    The insert runs as the single SQLite writer (see sqlite_profile.SQLiteWriter)."""
+    user = User.query.filter_by(telegram_id=telegram_id).first()
+    if user:
+        return user
+    # The writer slot must not be taken inside an open read transaction
+    db.session.rollback()
+    with sqlite_writer.transaction():
+        # Someone may have created it while we waited for the slot
+        user = User.query.filter_by(telegram_id=telegram_id).first()
+        if not user:
+            user = User(telegram_id=telegram_id, **fields)
+            db.session.add(user)
+            db.session.commit()
+        user_id = user.id
+    return db.session.get(User, user_id)
 
+@limiter.user_loader
 def ensure_session_from_header() -> bool:
     """If session is missing, try to restore it from Telegram init data header.
     Frontend sends 'X-Telegram-Init-Data' with WebApp initData. We parse (and optionally verify)
@@ -36,16 +108,12 @@ def ensure_session_from_header() -> bool:
         user_data = parse_telegram_user_data(init_data)
         if not user_data:
             return False
-        user = User.query.filter_by(telegram_id=user_data['id']).first()
-        if not user:
-            user = User(
-                telegram_id=user_data['id'],
-                username=user_data.get('username'),
-                first_name=user_data.get('first_name'),
-                last_name=user_data.get('last_name')
-            )
-            db.session.add(user)
-            db.session.commit()
+        user = get_or_create_user(
+            user_data['id'],
+            username=user_data.get('username'),
+            first_name=user_data.get('first_name'),
+            last_name=user_data.get('last_name')
+        )
         session['user_id'] = user.id
         session['telegram_id'] = user.telegram_id
         return True
@@ -60,31 +128,32 @@ def index():
     
     # Development-only: optionally seed a test user when Telegram auth is disabled
     if not user_id and os.environ.get('DISABLE_TELEGRAM_AUTH', '').lower() in ('1', 'true', 'yes'):
-        test_user = User.query.filter_by(telegram_id=12345).first()
-        if not test_user:
-            test_user = User(
-                telegram_id=12345,
-                first_name='Тестовый пользователь',
-                username='testuser'
-            )
-            db.session.add(test_user)
-            db.session.commit()
+        test_user = get_or_create_user(12345, first_name='Тестовый пользователь', username='testuser')
         session['user_id'] = test_user.id
         user_id = test_user.id
     
     current_user = User.query.get(user_id) if user_id else None
-    user_listings = []
     
-    if user_id:
-        user_listings = Listing.query.filter_by(
-            seller_id=user_id
-        ).filter(
-            Listing.status.in_([ListingStatus.ACTIVE, ListingStatus.ENDED])
-        ).order_by(desc(Listing.created_at)).limit(5).all()
+    def render_recent_listings():
+        user_listings = []
+        if user_id:
+            user_listings = Listing.query.filter_by(
+                seller_id=user_id
+            ).filter(
+                Listing.status.in_([ListingStatus.ACTIVE, ListingStatus.ENDED])
+            ).options(
+                selectinload(Listing.photos)
+            ).order_by(desc(Listing.created_at)).limit(5).all()
+        return render_template('partials/home_listings.html', user_listings=user_listings,
+                               bid_counts=bid_counts_for(user_listings))
+    
+    version = current_user.listings_version if current_user else 0
+    listings_fragment = fragment_cache.get_or_render((user_id, version, 'home'), render_recent_listings)
     
-    return render_template('index.html', user_listings=user_listings, current_user=current_user)
+    return render_template('index.html', listings_fragment=listings_fragment, current_user=current_user)
 
 @app.route('/api/auth', methods=['POST'])
+@sqlite_writer.serialized
 def authenticate():
     """Authenticate user via Telegram WebApp"""
     try:
@@ -174,18 +243,16 @@ def create_listing():
     # For development: seed a test user like on index() if no session exists.
     # In production, require Telegram WebApp auth.
     if 'user_id' not in session and os.environ.get('DISABLE_TELEGRAM_AUTH', '').lower() in ('1', 'true', 'yes'):
-        test_user = User.query.filter_by(telegram_id=12345).first()
-        if not test_user:
-            test_user = User(
-                telegram_id=12345,
-                first_name='Тестовый пользователь',
-                username='testuser'
-            )
-            db.session.add(test_user)
-            db.session.commit()
+        test_user = get_or_create_user(12345, first_name='Тестовый пользователь', username='testuser')
         session['user_id'] = test_user.id
         session['telegram_id'] = test_user.telegram_id
-    return render_template('create_listing.html')
+    photo_upload_config = {
+        'maxDimension': app.config['PHOTO_MAX_DIMENSION'],
+        'quality': app.config['PHOTO_QUALITY'] / 100,
+        'workerUrl': asset_url(app, 'js/image-worker.js'),
+        'storageBackend': app.config['STORAGE_BACKEND']
+    }
+    return render_template('create_listing.html', photo_upload_config=photo_upload_config)
 
 @app.route('/my-listings')
 def my_listings():
@@ -202,21 +269,48 @@ def my_listings():
             user_id = first_user.id
             session['user_id'] = user_id
     status_filter = request.args.get('status', 'all')
+    page = max(request.args.get('page', 1, type=int), 1)
     
-    query = Listing.query.filter_by(seller_id=user_id)
-    
-    if status_filter == 'active':
-        query = query.filter_by(status=ListingStatus.ACTIVE)
-    elif status_filter == 'ended':
-        query = query.filter(Listing.status.in_([ListingStatus.ENDED, ListingStatus.SOLD, ListingStatus.CLOSED]))
-    elif status_filter == 'draft':
-        query = query.filter_by(status=ListingStatus.DRAFT)
+    def render_listing_cards():
+        query = Listing.query.filter_by(seller_id=user_id)
+        
+        if status_filter == 'active':
+            query = query.filter_by(status=ListingStatus.ACTIVE)
+        elif status_filter == 'ended':
+            query = query.filter(Listing.status.in_([ListingStatus.ENDED, ListingStatus.SOLD, ListingStatus.CLOSED]))
+        elif status_filter == 'draft':
+            query = query.filter_by(status=ListingStatus.DRAFT)
+        
+        query = query.options(
+            selectinload(Listing.photos)
+        ).order_by(desc(Listing.created_at), desc(Listing.id))
+        if status_filter in ('all', 'ended'):
+            # Archived listings are all finished; list them after the hot ones
+            archived = ArchivedListing.query.filter_by(seller_id=user_id).filter(fully_archived()).options(
+                selectinload(ArchivedListing.photos)
+            ).order_by(desc(ArchivedListing.created_at), desc(ArchivedListing.id))
+            pagination = ChainedPagination([query, archived], page, app.config['LISTINGS_PER_PAGE'])
+        else:
+            pagination = query.paginate(
+                page=page,
+                per_page=app.config['LISTINGS_PER_PAGE'],
+                error_out=False
+            )
+        return render_template('partials/my_listings_cards.html', listings=pagination.items,
+                               pagination=pagination, status_filter=status_filter,
+                               bid_counts=bid_counts_for(pagination.items))
     
-    listings = query.order_by(desc(Listing.created_at)).all()
+    seller = db.session.get(User, user_id) if user_id else None
+    version = seller.listings_version if seller else 0
+    listings_fragment = fragment_cache.get_or_render(
+        (user_id, version, 'my_listings', status_filter, page), render_listing_cards
+    )
     
-    return render_template('my_listings.html', listings=listings, status_filter=status_filter)
+    return render_template('my_listings.html', listings_fragment=listings_fragment, status_filter=status_filter)
 
 @app.route('/api/listings', methods=['POST'])
+@limiter.limit(Limit('user', burst=5, rate=10 / 60))
+@sqlite_writer.serialized
 def create_listing_api():
     """Create a new listing"""
     if 'user_id' not in session and not ensure_session_from_header():
@@ -227,20 +321,6 @@ def create_listing_api():
     try:
         data = request.get_json()
         
-        # Helpers to safely parse numbers
-        def num_or_none(val):
-            if val is None:
-                return None
-            if isinstance(val, (int, float, Decimal)):
-                return val
-            val_str = str(val).strip()
-            if val_str == '':
-                return None
-            try:
-                return float(val_str)
-            except ValueError:
-                return None
-        
         # Create new listing
         listing = Listing(
             title=data['title'],
@@ -253,16 +333,16 @@ def create_listing_api():
         
         # Set mode-specific fields
         if listing.sale_mode == SaleMode.FIXED_PRICE:
-            listing.fixed_price = num_or_none(data.get('fixed_price'))
+            listing.fixed_price_minor = to_minor_units(data.get('fixed_price'))
             listing.is_negotiable = data.get('is_negotiable', False)
-            listing.current_price = listing.fixed_price
+            listing.current_price_minor = listing.fixed_price_minor
         elif listing.sale_mode == SaleMode.NAME_YOUR_PRICE:
-            listing.min_price = num_or_none(data.get('min_price'))
+            listing.min_price_minor = to_minor_units(data.get('min_price'))
             listing.private_offers = data.get('private_offers', False)
         elif listing.sale_mode == SaleMode.AUCTION:
-            listing.start_price = num_or_none(data.get('start_price'))
-            listing.current_price = listing.start_price
-            listing.bid_step = num_or_none(data.get('bid_step')) or 1.00
+            listing.start_price_minor = to_minor_units(data.get('start_price'))
+            listing.current_price_minor = listing.start_price_minor
+            listing.bid_step_minor = to_minor_units(data.get('bid_step')) or 100
             if data.get('end_time'):
                 listing.end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
         
@@ -282,6 +362,8 @@ def create_listing_api():
         return jsonify({'error': 'Failed to create listing', 'detail': str(e)}), 500
 
 @app.route('/api/listings/<int:listing_id>/photos', methods=['POST'])
+@limiter.limit(Limit('user', burst=10, rate=0.5))
+@limiter.bounded(app.config['IMAGE_PROCESSING_CONCURRENCY'])
 def upload_photos(listing_id):
     """Upload photos for a listing"""
     if 'user_id' not in session and not ensure_session_from_header():
@@ -294,30 +376,20 @@ def upload_photos(listing_id):
         return jsonify({'error': 'Listing not found or access denied'}), 404
     
     try:
-        uploaded_files = []
+        keys = []
         
         for file_key in request.files:
             file = request.files[file_key]
             if file and file.filename:
                 filename = process_uploaded_image(file)
                 if filename:
-                    # Get current max order
-                    max_order = db.session.query(db.func.max(ListingPhoto.order)).filter_by(listing_id=listing_id).scalar() or 0
-                    
-                    photo = ListingPhoto(
-                        filename=filename,
-                        order=max_order + 1,
-                        listing_id=listing_id
-                    )
-                    db.session.add(photo)
-                    uploaded_files.append({
-                        'id': photo.id,
-                        'filename': filename,
-                        'url': f"/static/uploads/{filename}",
-                        'order': photo.order
-                    })
+                    keys.append(filename)
         
-        db.session.commit()
+        # Image processing is slow; take the writer slot only for the inserts
+        db.session.rollback()
+        with sqlite_writer.transaction():
+            uploaded_files = [add_listing_photo(listing_id, key) for key in keys]
+            db.session.commit()
         
         return jsonify({
             'success': True,
@@ -329,7 +401,276 @@ def upload_photos(listing_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to upload photos'}), 500
 
+def add_listing_photo(listing_id, key):
+    """Record a stored photo as the listing's last photo; returns its API representation"""
+    max_order = db.session.query(db.func.max(ListingPhoto.order)).filter_by(listing_id=listing_id).scalar() or 0
+    
+    photo = ListingPhoto(
+        filename=key,
+        order=max_order + 1,
+        listing_id=listing_id
+    )
+    db.session.add(photo)
+    db.session.flush()
+    return {
+        'id': photo.id,
+        'filename': key,
+        'url': photo_url(key),
+        'order': photo.order
+    }
+
+@app.route('/api/listings/<int:listing_id>/photos/presign', methods=['POST'])
+@limiter.limit(Limit('user', burst=20, rate=1.0))
+def presign_photo_upload(listing_id):
+    """Start a direct upload: the client sends the bytes straight to storage,
+    then calls /photos/complete with the returned upload_id.
+    """
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    listing = Listing.query.filter_by(id=listing_id, seller_id=session['user_id']).first()
+    if not listing:
+        return jsonify({'error': 'Listing not found or access denied'}), 404
+    
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    content_type = data.get('content_type', '')
+    size = data.get('size')
+    max_bytes = app.config['DIRECT_UPLOAD_MAX_BYTES']
+    
+    if not allowed_file(filename) or not content_type.startswith('image/'):
+        return jsonify({'error': 'Unsupported file type'}), 400
+    if size is not None and (not isinstance(size, int) or size <= 0 or size > max_bytes):
+        return jsonify({'error': f'File must be at most {max_bytes} bytes'}), 400
+    
+    try:
+        key = new_photo_key(filename)
+        expires_in = app.config['DIRECT_UPLOAD_EXPIRES']
+        upload = get_storage().presign_upload(key, content_type, max_bytes, expires_in)
+    except Exception as e:
+        app.logger.error(f"Error presigning upload: {e}")
+        return jsonify({'error': 'Failed to prepare upload'}), 500
+    
+    return jsonify({
+        'success': True,
+        'upload_id': sign_upload('ticket', {'listing_id': listing_id, 'key': key}),
+        'upload': upload,
+        'expires_in': expires_in
+    })
+
+@app.route('/api/uploads/direct/<token>', methods=['PUT'])
+def direct_upload_put(token):
+    """Local-backend stand-in for a presigned storage URL: streams the body to disk"""
+    grant = load_upload('local-put', token, app.config['DIRECT_UPLOAD_EXPIRES'])
+    if not grant:
+        return jsonify({'error': 'Upload grant invalid or expired'}), 403
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if not 0 < request.content_length <= grant['max']:
+        return jsonify({'error': 'File too large'}), 413
+    if request.mimetype != grant['type']:
+        return jsonify({'error': 'Content-Type does not match upload grant'}), 400
+    
+    try:
+        # A grant is good for one upload: stored photos are immutable
+        get_storage().save(grant['key'], request.stream, grant['type'], overwrite=False)
+    except FileExistsError:
+        return jsonify({'error': 'Upload already stored'}), 409
+    except Exception as e:
+        app.logger.error(f"Error storing direct upload: {e}")
+        return jsonify({'error': 'Failed to store upload'}), 500
+    
+    return '', 204
+
+@app.route('/api/listings/<int:listing_id>/photos/complete', methods=['POST'])
+@limiter.bounded(app.config['IMAGE_PROCESSING_CONCURRENCY'])
+def complete_photo_upload(listing_id):
+    """Record a photo uploaded directly to storage. The upload itself bypasses the app;
+    here only the first IMAGE_HEADER_BYTES are read back to check it is an image."""
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    listing = Listing.query.filter_by(id=listing_id, seller_id=session['user_id']).first()
+    if not listing:
+        return jsonify({'error': 'Listing not found or access denied'}), 404
+    
+    data = request.get_json() or {}
+    # Allow for the upload itself taking up to the full grant lifetime
+    ticket = load_upload('ticket', data.get('upload_id', ''), 2 * app.config['DIRECT_UPLOAD_EXPIRES'])
+    if not ticket or ticket['listing_id'] != listing_id:
+        return jsonify({'error': 'Invalid upload_id'}), 400
+    
+    storage = get_storage()
+    size = storage.size(ticket['key'])
+    if size is None:
+        return jsonify({'error': 'Upload not found in storage'}), 400
+    if size > app.config['DIRECT_UPLOAD_MAX_BYTES']:
+        storage.delete(ticket['key'])
+        return jsonify({'error': 'File too large'}), 413
+    # The bytes never passed through us; check they start like an image (headers only,
+    # so the object isn't downloaded back through the app)
+    if not is_image_header(storage.read(ticket['key'], IMAGE_HEADER_BYTES)):
+        storage.delete(ticket['key'])
+        return jsonify({'error': 'Invalid image'}), 400
+    
+    try:
+        db.session.rollback()
+        with sqlite_writer.transaction():
+            if ListingPhoto.query.filter_by(listing_id=listing_id, filename=ticket['key']).first():
+                return jsonify({'error': 'Upload already completed'}), 409
+            photo = add_listing_photo(listing_id, ticket['key'])
+            db.session.commit()
+        return jsonify({'success': True, 'photos': [photo]})
+    except Exception as e:
+        app.logger.error(f"Error completing upload: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to save photo'}), 500
+
+def parse_chunk_range(size):
+    """(start, length) of a chunk PUT from Content-Range ("bytes 0-262143/1048576") or ?offset=.
+    A Content-Range total must match the size declared when the upload was created."""
+    content_range = request.headers.get('Content-Range', '')
+    if content_range:
+        match = re.match(r'^bytes (\d+)-(\d+)/(\d+|\*)$', content_range.strip())
+        if not match:
+            raise ResumableUploadError('Malformed Content-Range')
+        start, end = int(match.group(1)), int(match.group(2))
+        if end < start:
+            raise ResumableUploadError('Malformed Content-Range')
+        if match.group(3) != '*' and int(match.group(3)) != size:
+            raise ResumableUploadError('Content-Range total does not match the upload size')
+        return start, end - start + 1
+    if request.content_length is None:
+        raise ResumableUploadError('Content-Length required', 411)
+    return request.args.get('offset', 0, type=int), request.content_length
+
+@app.route('/api/listings/<int:listing_id>/uploads', methods=['POST'])
+@limiter.limit(Limit('user', burst=20, rate=1.0))
+def create_resumable_upload(listing_id):
+    """Start a resumable chunked photo upload.
+    Protocol: init here -> PUT byte ranges in any order -> GET to query the offset
+    after a dropped connection -> POST .../complete to process and attach the photo.
+    """
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    listing = Listing.query.filter_by(id=listing_id, seller_id=session['user_id']).first()
+    if not listing:
+        return jsonify({'error': 'Listing not found or access denied'}), 404
+    
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    content_type = data.get('content_type', '')
+    if not allowed_file(filename) or not content_type.startswith('image/'):
+        return jsonify({'error': 'Unsupported file type'}), 400
+    
+    upload_store.maybe_purge_stale(app.config['RESUMABLE_UPLOAD_TTL'])
+    try:
+        meta = upload_store.create(session['user_id'], listing_id, filename, content_type, data.get('size'))
+    except ResumableUploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    return jsonify({
+        'success': True,
+        'upload_id': meta['upload_id'],
+        'chunk_size': app.config['RESUMABLE_CHUNK_SIZE'],
+        'max_chunk_size': upload_store.max_chunk_size,
+        'offset': 0
+    })
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@limiter.limit(Limit('user', burst=120, rate=30.0))
+def resumable_upload(upload_id):
+    """GET: received ranges/offset; PUT: write one chunk; DELETE: abandon the upload"""
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        meta = upload_store.meta(upload_id, session['user_id'])
+        if request.method == 'DELETE':
+            upload_store.discard(upload_id)
+            return jsonify({'success': True})
+        if request.method == 'PUT':
+            start, length = parse_chunk_range(meta['size'])
+            upload_store.write_chunk(meta, start, length, request.stream)
+        return jsonify(upload_store.status(meta))
+    except ResumableUploadError as e:
+        payload = {'error': str(e)}
+        if e.status != 404:
+            payload.update(upload_store.status(meta))
+        return jsonify(payload), e.status
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@limiter.limit(Limit('user', burst=10, rate=0.5))
+@limiter.bounded(app.config['IMAGE_PROCESSING_CONCURRENCY'])
+def complete_resumable_upload(upload_id):
+    """Assemble the staged file, run it through image processing and attach it to the listing"""
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        meta = upload_store.meta(upload_id, session['user_id'])
+    except ResumableUploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    status = upload_store.status(meta)
+    if not status['complete']:
+        return jsonify({'error': 'Upload is missing chunks', **status}), 409
+    
+    listing = Listing.query.filter_by(id=meta['listing_id'], seller_id=session['user_id']).first()
+    if not listing:
+        upload_store.discard(upload_id)
+        return jsonify({'error': 'Listing not found or access denied'}), 404
+    
+    try:
+        with open(upload_store.data_path(meta), 'rb') as stream:
+            key = process_uploaded_image(
+                FileStorage(stream=stream, filename=meta['filename'], content_type=meta['content_type'])
+            )
+        if not key:
+            upload_store.discard(upload_id)
+            return jsonify({'error': 'Invalid image'}), 400
+        
+        db.session.rollback()
+        with sqlite_writer.transaction():
+            photo = add_listing_photo(meta['listing_id'], key)
+            db.session.commit()
+        upload_store.discard(upload_id)
+        return jsonify({'success': True, 'photos': [photo]})
+    except Exception as e:
+        app.logger.error(f"Error completing resumable upload: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to save photo'}), 500
+
+@app.route(f"{app.config['UPLOAD_URL_PREFIX']}/<path:key>")
+def serve_upload(key):
+    """Serve a stored photo. Keys are random and never reused, so responses are immutable.
+    Local files are handed to nginx (X-Accel-Redirect) or sent with sendfile/X-Sendfile.
+    """
+    storage = get_storage()
+    if storage.name != 'local':
+        return redirect(storage.url(key))
+    
+    try:
+        path = storage.path(key)
+    except StorageError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+    
+    accel_prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+    if accel_prefix:
+        response = app.response_class(
+            mimetype=mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{key}"
+    else:
+        response = send_from_directory(storage.root, key)
+    response.headers['Cache-Control'] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return response
+
 @app.route('/api/listings/<int:listing_id>/publish', methods=['POST'])
+@sqlite_writer.serialized
 def publish_listing(listing_id):
     """Publish a listing"""
     if 'user_id' not in session and not ensure_session_from_header():
@@ -354,6 +695,7 @@ def publish_listing(listing_id):
         return jsonify({'error': 'Failed to publish listing'}), 500
 
 @app.route('/api/listings/<int:listing_id>/close', methods=['POST'])
+@sqlite_writer.serialized
 def close_listing(listing_id):
     """Close a listing"""
     if 'user_id' not in session and not ensure_session_from_header():
@@ -377,6 +719,8 @@ def close_listing(listing_id):
         return jsonify({'error': 'Failed to close listing'}), 500
 
 @app.route('/api/listings/<int:listing_id>/bid', methods=['POST'])
+@limiter.limit(Limit('user', burst=5, rate=1.0), Limit('listing', burst=50, rate=20.0))
+@sqlite_writer.serialized
 def place_bid(listing_id):
     """Place a bid on a listing"""
     if 'user_id' not in session and not ensure_session_from_header():
@@ -392,18 +736,21 @@ def place_bid(listing_id):
     
     try:
         data = request.get_json()
-        amount = float(data['amount'])
+        amount_minor = to_minor_units(data.get('amount'))
         message = data.get('message', '')
         
-        # Validate bid amount
+        if amount_minor is None:
+            return jsonify({'error': 'Invalid bid amount'}), 400
+        
+        # Validate bid amount (exact integer comparison in minor units)
         if listing.sale_mode == SaleMode.AUCTION:
-            min_bid = float(listing.current_price) + float(listing.bid_step)
-            if amount < min_bid:
-                return jsonify({'error': f'Bid must be at least ${min_bid:.2f}'}), 400
+            min_bid = (listing.current_price_minor or 0) + (listing.bid_step_minor or 0)
+            if amount_minor < min_bid:
+                return jsonify({'error': f'Bid must be at least {format_price_exact(min_bid)}'}), 400
         
         # Create bid
         bid = Bid(
-            amount=amount,
+            amount_minor=amount_minor,
             message=message,
             listing_id=listing_id,
             bidder_id=session['user_id'],
@@ -414,9 +761,10 @@ def place_bid(listing_id):
         
         # Update listing current price for auctions
         if listing.sale_mode == SaleMode.AUCTION:
-            listing.current_price = amount
+            listing.current_price_minor = amount_minor
         
         db.session.commit()
+        stats_counter.record(listing_id, bids=1)
         
         return jsonify({'success': True, 'bid_id': bid.id})
         
@@ -425,47 +773,166 @@ def place_bid(listing_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to place bid'}), 500
 
-@app.route('/api/listings/<int:listing_id>')
-def get_listing(listing_id):
-    """Get listing details"""
-    listing = Listing.query.get_or_404(listing_id)
-    
-    # Get photos
-    photos = [{'url': f"/static/uploads/{photo.filename}", 'order': photo.order} 
-              for photo in listing.photos]
-    
-    # Get bids (only public ones unless owner)
-    bids_query = Bid.query.filter_by(listing_id=listing_id)
-    if session.get('user_id') != listing.seller_id:
-        bids_query = bids_query.filter_by(is_private=False)
+@app.route('/api/listings/<int:listing_id>/claim', methods=['POST'])
+@limiter.limit(Limit('user', burst=5, rate=1.0))
+@sqlite_writer.serialized
+def claim_listing_api(listing_id):
+    """Claim a FREE/fixed-price allow_queue listing: first come holds it, the rest wait in line"""
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
     
-    bids = bids_query.order_by(desc(Bid.created_at)).all()
+    listing = Listing.query.get_or_404(listing_id)
+    try:
+        claim = claim_listing(listing, session['user_id'])
+    except ClaimError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'success': True, 'claim': claim_status(claim)})
+
+@app.route('/api/listings/<int:listing_id>/claim', methods=['GET', 'DELETE'])
+@sqlite_writer.serialized
+def my_claim(listing_id):
+    """GET: your place in line (the seller gets the queue summary); DELETE: give up your claim"""
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
     
-    bid_list = [{
-        'amount': float(bid.amount),
-        'message': bid.message,
-        'created_at': bid.created_at.isoformat(),
-        'bidder_name': bid.bidder.first_name or bid.bidder.username or 'Anonymous'
-    } for bid in bids]
+    user_id = session['user_id']
+    listing = Listing.query.get_or_404(listing_id)
+    if request.method == 'DELETE':
+        try:
+            release_claim(listing_id, user_id)
+        except ClaimError as e:
+            return jsonify({'error': str(e)}), e.status
+        return jsonify({'success': True})
     
-    # Calculate time remaining for auctions
-    time_remaining = None
-    if listing.sale_mode == SaleMode.AUCTION and listing.end_time:
-        time_remaining = calculate_time_remaining(listing.end_time)
+    expire_lapsed_hold(listing_id)
+    if listing.seller_id == user_id:
+        holder = Claim.query.filter_by(listing_id=listing_id, status=ClaimStatus.HOLDING).first()
+        return jsonify({
+            'queue_length': queue_length(listing_id),
+            'holder': claim_status(holder) if holder else None
+        })
+    claim = get_claim(listing_id, user_id)
+    if claim is None:
+        return jsonify({'error': 'No claim'}), 404
+    return jsonify({'claim': claim_status(claim)})
+
+@app.route('/api/listings/<int:listing_id>/claim/complete', methods=['POST'])
+@sqlite_writer.serialized
+def complete_claim_api(listing_id):
+    """Seller hands the item to the current holder; the listing becomes sold"""
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
     
-    return jsonify({
-        'id': listing.id,
-        'title': listing.title,
-        'description': listing.description,
-        'sale_mode': listing.sale_mode.value,
-        'current_price': float(listing.current_price) if listing.current_price else None,
-        'status': listing.status.value,
-        'photos': photos,
-        'bids': bid_list,
-        'time_remaining': time_remaining,
-        'seller_name': listing.seller.first_name or listing.seller.username,
-        'is_owner': session.get('user_id') == listing.seller_id
-    })
+    listing = Listing.query.filter_by(id=listing_id, seller_id=session['user_id']).first()
+    if not listing:
+        return jsonify({'error': 'Listing not found or access denied'}), 404
+    try:
+        claim = complete_claim(listing)
+    except ClaimError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'success': True, 'winner_id': claim.user_id})
+
+@app.route('/api/listings', methods=['GET'])
+def search_listings():
+    """List active listings, optionally filtered by price range (major units).
+    Supports `fields=` like get_listing (defaults to the "summary" projection).
+    """
+    fields = parse_listing_fields(request.args.get('fields'), default='summary')
+    if not fields:
+        return jsonify({'error': 'Unknown field requested'}), 400
+
+    price_min = to_minor_units(request.args.get('price_min'))
+    price_max = to_minor_units(request.args.get('price_max'))
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    # Served by ix_listing_status_effective_price
+    query = select_listings(fields).where(Listing.status == ListingStatus.ACTIVE)
+    if price_min is not None:
+        query = query.where(Listing.effective_price_minor >= price_min)
+    if price_max is not None:
+        query = query.where(Listing.effective_price_minor <= price_max)
+
+    rows = db.session.execute(
+        query.order_by(Listing.effective_price_minor.asc(), Listing.id.asc()).limit(limit)
+    ).all()
+
+    for row in rows:
+        stats_counter.record(row.id, impressions=1)
+
+    return jsonify({'listings': serialize_listing_rows(rows, fields, session.get('user_id'))})
+
+@app.route('/api/listings/<int:listing_id>')
+def get_listing(listing_id):
+    """Get listing details.
+    `fields=` selects a subset (e.g. "countdown" or "id,current_price,time_remaining");
+    only the needed columns are loaded and relationship queries are skipped unless asked for.
+    """
+    fields = parse_listing_fields(request.args.get('fields'))
+    if not fields:
+        return jsonify({'error': 'Unknown field requested'}), 400
+
+    archived = False
+    row = db.session.execute(select_listings(fields).where(Listing.id == listing_id)).first()
+    if row is None:
+        # Finished listings move to the archive tables after a while (see archive.py)
+        archived = True
+        row = db.session.execute(
+            select_listings(fields, ArchivedListing).where(ArchivedListing.id == listing_id)
+        ).first()
+    if row is None:
+        abort(404)
+
+    viewer_id = session.get('user_id')
+    # Only someone else opening the listing page is a view: not polls of a projection
+    # like "countdown", and not the seller looking at their own listing
+    if 'description' in fields:
+        seller_id = row._mapping.get('seller_id')
+        if seller_id is None:
+            model = ArchivedListing if archived else Listing
+            seller_id = db.session.query(model.seller_id).filter(model.id == listing_id).scalar()
+        if viewer_id != seller_id:
+            stats_counter.record(listing_id, views=1)
+    return jsonify(serialize_listing_rows([row], fields, viewer_id, archived)[0])
+
+@app.route('/api/seller/stats')
+def seller_stats_api():
+    """Views, impressions, bids and conversion for the current seller over the last `days` days.
+    Served from the daily rollup tables; counts lag by up to STATS_FLUSH_INTERVAL seconds.
+    """
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    return jsonify(seller_stats(session['user_id'], days))
+
+@app.route('/api/export')
+def export_my_listings():
+    """Stream the current seller's listings (incl. archived), photo URLs and bids.
+    `format=ndjson|csv`; every record has a `cursor`, pass the last one received as
+    `cursor=` to resume an interrupted download. Gzipped on the fly when accepted.
+    """
+    if 'user_id' not in session and not ensure_session_from_header():
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    cursor = request.args.get('cursor')
+    try:
+        parse_cursor(cursor)
+    except ExportCursorError as e:
+        return jsonify({'error': str(e)}), 400
+
+    chunks = encode_export(iter_export_records(session['user_id'], cursor), fmt, header=not cursor)
+    headers = {
+        'Content-Disposition': f'attachment; filename="listings-export.{fmt}"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.accept_encodings['gzip'] > 0:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return app.response_class(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt], headers=headers)
 
 # Debug helper to inspect session/auth state
 @app.route('/api/whoami')
@@ -482,6 +949,33 @@ def whoami():
         'first_name': user.first_name if user else None
     })
 
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve fingerprinted bundles built by scripts/build_assets.py.
+    Picks the precompressed variant by Accept-Encoding; names are content-hashed,
+    so responses can be cached forever.
+    """
+    directory = dist_path(app)
+    encoding, served = pick_encoding(request.accept_encodings, filename, directory)
+    response = send_from_directory(
+        directory,
+        served,
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return response
+
+@app.template_global('asset_url')
+def asset_url_global(filename):
+    return asset_url(app, filename)
+
+@app.template_global('photo_url')
+def photo_url_global(key):
+    return photo_url(key)
+
 @app.template_filter('format_price')
 def format_price_filter(amount):
     return format_price(amount)
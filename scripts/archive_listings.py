@@ -0,0 +1,52 @@
+"""
+Usage:
+  python scripts/archive_listings.py [--older-than-days N] [--batch-size N] [--bid-batch-size N]
+                                     [--pause SECONDS] [--max-batches N] [--dry-run]
+
+Moves CLOSED/SOLD/ENDED listings that finished more than N days ago (default
+ARCHIVE_AFTER_DAYS), with their bids and photos, into the archive tables.
+Works in short batches so the hot tables stay available; safe to interrupt and
+re-run, e.g. nightly from cron. Uses the same DATABASE_URL as the app.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    from app import app
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=app.config['ARCHIVE_AFTER_DAYS'])
+    parser.add_argument("--batch-size", type=int, default=app.config['ARCHIVE_BATCH_SIZE'],
+                        help="listings per transaction")
+    parser.add_argument("--bid-batch-size", type=int, default=5000, help="bids per transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between transactions")
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+    args = parser.parse_args()
+
+    from datetime import datetime, timedelta
+    from archive import archive_finished_listings, count_archivable_listings
+
+    with app.app_context():
+        if args.dry_run:
+            cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+            print(f"[dry-run] {count_archivable_listings(cutoff)} listings to archive")
+            return
+        listings, bids = archive_finished_listings(
+            args.older_than_days,
+            batch_size=args.batch_size,
+            bid_batch_size=args.bid_batch_size,
+            pause=args.pause,
+            max_batches=args.max_batches,
+            log=print
+        )
+        print(f"OK: archived {listings} listings and {bids} bids")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Usage:
+  python scripts/bench_archive.py [FINISHED_LISTINGS] [BIDS_PER_LISTING]
+
+Builds a throwaway SQLite database with a large history of finished listings
+(default 20,000 x 500 = 10M bids; pass e.g. 100000 300 for 30M), plus 200 active
+auctions, and measures the hot path before and after scripts/archive_listings.py
+would run:
+  - GET /api/listings/<id> (full projection, incl. bids) on active listings
+  - POST /api/listings/<id>/bid
+  - GET /api/listings/<id> on an archived listing (the cold path)
+"""
+
+import os
+import sys
+import tempfile
+import itertools
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ACTIVE_LISTINGS = 200
+INSERT_CHUNK = 50_000
+# Bids must keep rising across both measurement rounds
+BID_AMOUNTS = itertools.count(100)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    return f"p50 {pick(0.5):7.2f} ms   p99 {pick(0.99):7.2f} ms"
+
+
+def seed(db, finished, bids_per_listing):
+    from models import User, Listing, Bid, SaleMode, ListingStatus
+
+    conn = db.session.connection()
+    conn.execute(User.__table__.insert(), [
+        {'telegram_id': 1000 + i, 'first_name': f'user{i}', 'listings_version': 0} for i in range(100)
+    ])
+    old = datetime.utcnow() - timedelta(days=365)
+    now = datetime.utcnow()
+
+    def listing(i, status, when):
+        return {'title': f'Listing {i}', 'sale_mode': SaleMode.AUCTION.name, 'status': status.name,
+                'start_price_minor': 1000, 'current_price_minor': 1000, 'bid_step_minor': 100,
+                'effective_price_minor': 1000, 'seller_id': 1 + i % 100, 'created_at': when,
+                'published_at': when, 'end_time': when + timedelta(days=7), 'closed_at': None}
+
+    rows = [listing(i, ListingStatus.ENDED, old) for i in range(finished)]
+    rows += [listing(finished + i, ListingStatus.ACTIVE, now) for i in range(ACTIVE_LISTINGS)]
+    conn.exec_driver_sql(
+        'INSERT INTO listing (title, sale_mode, status, start_price_minor, current_price_minor, bid_step_minor, '
+        'effective_price_minor, seller_id, created_at, published_at, end_time, closed_at) VALUES '
+        '(:title, :sale_mode, :status, :start_price_minor, :current_price_minor, :bid_step_minor, '
+        ':effective_price_minor, :seller_id, :created_at, :published_at, :end_time, :closed_at)', rows
+    )
+
+    batch = []
+    total = finished * bids_per_listing
+    for n in range(total):
+        batch.append({'amount_minor': 1100 + n % bids_per_listing * 100, 'listing_id': 1 + n // bids_per_listing,
+                      'bidder_id': 1 + n % 97, 'created_at': old, 'is_private': False})
+        if len(batch) == INSERT_CHUNK:
+            conn.execute(Bid.__table__.insert(), batch)
+            batch = []
+            print(f"\rseeding bids {n + 1:,}/{total:,}", end='', flush=True)
+    if batch:
+        conn.execute(Bid.__table__.insert(), batch)
+    db.session.commit()
+    print()
+
+
+def measure(client, label, listing_ids, iterations=400):
+    reads, writes = [], []
+    for i in range(iterations):
+        listing_id = listing_ids[i % len(listing_ids)]
+        start = time.perf_counter()
+        assert client.get(f'/api/listings/{listing_id}').status_code == 200
+        reads.append(time.perf_counter() - start)
+
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1 + (listing_id + 1) % 100
+        start = time.perf_counter()
+        response = client.post(f'/api/listings/{listing_id}/bid', json={'amount': next(BID_AMOUNTS)})
+        writes.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+    print(f"{label:<26} get_listing {percentiles(reads)} | place_bid {percentiles(writes)}")
+
+
+def main():
+    finished = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    bids_per_listing = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+
+    from app import app, db
+    from archive import archive_finished_listings
+    from models import Bid, ArchivedBid
+
+    client = app.test_client()
+    with app.app_context():
+        seed(db, finished, bids_per_listing)
+        active_ids = list(range(finished + 1, finished + ACTIVE_LISTINGS + 1))
+
+        measure(client, f"hot, {db.session.query(Bid).count():,} bids", active_ids)
+
+        start = time.perf_counter()
+        listings, bids = archive_finished_listings(30, batch_size=500, pause=0)
+        print(f"archived {listings:,} listings / {bids:,} bids in {time.perf_counter() - start:.1f} s")
+
+        measure(client, f"hot, {db.session.query(Bid).count():,} bids", active_ids)
+
+        cold = []
+        for listing_id in range(1, min(finished, 200)):
+            start = time.perf_counter()
+            assert client.get(f'/api/listings/{listing_id}').status_code == 200
+            cold.append(time.perf_counter() - start)
+        print(f"{'archived get_listing':<26} ({db.session.query(ArchivedBid).count():,} archived bids) "
+              f"{percentiles(cold)}")
+
+
+if __name__ == "__main__":
+    main()
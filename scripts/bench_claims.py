@@ -0,0 +1,106 @@
+"""
+Usage:
+  python scripts/bench_claims.py [CLAIMANTS] [THREADS]
+
+Flash-crowd benchmark for the claim queue on a throwaway SQLite database:
+  - CLAIMANTS users (default 2000) claim the same FREE listing from THREADS
+    concurrent workers (default 32); reports throughput and p50/p99 latency and
+    checks there is exactly one holder and the waitlist is in arrival order
+  - then releases the holder repeatedly and times each hand-over to the next in line
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    return f"p50 {pick(0.5):7.2f} ms   p99 {pick(0.99):7.2f} ms"
+
+
+def main():
+    claimants = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from app import app, db
+    from claims import claim_listing, release_claim
+    from models import Claim, ClaimStatus, Listing, ListingStatus, SaleMode, User
+    from sqlite_profile import sqlite_writer
+
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {'telegram_id': 1000 + i, 'listings_version': 0} for i in range(claimants + 1)
+        ])
+        listing = Listing(title='Free sofa', sale_mode=SaleMode.FREE, status=ListingStatus.ACTIVE,
+                          allow_queue=True, seller_id=1)
+        db.session.add(listing)
+        db.session.commit()
+        listing_id = listing.id
+
+    latencies = []
+    errors = []
+    next_user = iter(range(2, claimants + 2))
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            while True:
+                with lock:
+                    user_id = next(next_user, None)
+                if user_id is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    # As in the route: claims run as the serialized writer
+                    with sqlite_writer.transaction():
+                        claim_listing(db.session.get(Listing, listing_id), user_id)
+                except Exception as e:  # report, don't hide
+                    errors.append(repr(e))
+                    db.session.rollback()
+                latencies.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    print(f"{claimants} claims, {threads} threads: {claimants / elapsed:,.0f} claims/s, "
+          f"{percentiles(latencies)}, {len(errors)} errors")
+    for error in errors[:5]:
+        print("  ", error)
+
+    with app.app_context():
+        holders = Claim.query.filter_by(listing_id=listing_id, status=ClaimStatus.HOLDING).count()
+        ids = [c.id for c in Claim.query.filter_by(listing_id=listing_id).order_by(Claim.id)]
+        print(f"holders: {holders} (expect 1), claims: {len(ids)}, ordered: {ids == sorted(ids)}")
+
+        handovers = []
+        for _ in range(min(500, claimants - 1)):
+            holder = Claim.query.filter_by(listing_id=listing_id, status=ClaimStatus.HOLDING).one()
+            expected = db.session.execute(
+                db.select(db.func.min(Claim.id)).where(
+                    Claim.listing_id == listing_id, Claim.status == ClaimStatus.WAITING)
+            ).scalar()
+            db.session.rollback()
+            start = time.perf_counter()
+            with sqlite_writer.transaction():
+                release_claim(listing_id, holder.user_id)
+            handovers.append(time.perf_counter() - start)
+            promoted = Claim.query.filter_by(listing_id=listing_id, status=ClaimStatus.HOLDING).one()
+            assert promoted.id == expected, (promoted.id, expected)
+        waiting = Claim.query.filter_by(listing_id=listing_id, status=ClaimStatus.WAITING).count()
+        print(f"release + promote ({waiting} still waiting): {percentiles(handovers)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Usage:
+  python scripts/bench_inline_search.py [LISTINGS] [QUERIES]
+
+Benchmark for the bot's inline search index (listing_index.py), without a database:
+  - indexes LISTINGS synthetic titles (default 1000000) and reports build time and
+    peak memory
+  - replays QUERIES (default 20000) as-you-type queries (every prefix of one to
+    three title words, plus misses and deep pages) and reports p50/p99/max latency
+  - times incremental upserts (new listings and retitled ones) and removals
+"""
+
+import gc
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BRANDS = ['iPhone', 'Samsung', 'Xiaomi', 'Sony', 'LG', 'Bosch', 'IKEA', 'Nike', 'Adidas', 'Lego',
+          'Canon', 'Nikon', 'Dyson', 'Philips', 'Apple', 'Huawei', 'Lenovo', 'Asus', 'Dell', 'HP']
+ITEMS = ['phone', 'charger', 'case', 'laptop', 'tablet', 'sofa', 'chair', 'table', 'lamp', 'bike',
+         'stroller', 'camera', 'lens', 'headphones', 'watch', 'jacket', 'sneakers', 'vacuum', 'kettle',
+         'монитор', 'диван', 'кровать', 'шкаф', 'велосипед', 'коляска', 'куртка', 'кроссовки', 'чайник']
+WORDS = ['new', 'used', 'black', 'white', 'red', 'large', 'small', 'pro', 'mini', 'max', 'kids',
+         'vintage', 'original', 'новый', 'б/у', 'детский', 'черный', 'белый', 'большой']
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    return f"p50 {pick(0.5):7.3f} ms   p99 {pick(0.99):7.3f} ms   max {samples[-1] * 1000:7.3f} ms"
+
+
+def random_title(rng):
+    parts = [rng.choice(BRANDS), rng.choice(ITEMS)]
+    parts += rng.sample(WORDS, rng.randint(0, 3))
+    if rng.random() < 0.5:
+        parts.append(str(rng.randint(1, 999)))
+    # A long tail of rare words, like real titles have
+    parts.append(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 8))))
+    rng.shuffle(parts)
+    return ' '.join(parts)
+
+
+def random_query(rng, titles):
+    kind = rng.random()
+    if kind < 0.05:
+        return 'zzqx' + str(rng.randint(0, 99))  # no match
+    words = rng.choice(titles).split()
+    words = rng.sample(words, min(len(words), rng.randint(1, 3)))
+    # Typing in progress: the last word is cut short
+    last = words[-1][:rng.randint(1, len(words[-1]))]
+    return ' '.join(words[:-1] + [last])
+
+
+def main():
+    listings = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    from listing_index import IndexedListing, ListingSearchIndex, is_open
+    from models import SaleMode
+
+    rng = random.Random(42)
+    titles = [random_title(rng) for _ in range(listings)]
+
+    index = ListingSearchIndex()
+    start = time.perf_counter()
+    index.bulk_load((listing_id, IndexedListing(title, SaleMode.FIXED_PRICE, 10000, None))
+                    for listing_id, title in enumerate(titles, 1))
+    build = time.perf_counter() - start
+    # As the bot does: keep the collector from walking the index's millions of objects
+    gc.freeze()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Indexed {len(index)} listings in {build:.1f} s, peak RSS {peak_mb:.0f} MB")
+
+    samples, deep = [], []
+    results = 0
+    for _ in range(queries):
+        query = random_query(rng, titles)
+        offset = rng.choice((0, 0, 0, 20, 100)) if rng.random() < 0.2 else 0
+        start = time.perf_counter()
+        ids, _ = index.search(query, offset, 20, accept=is_open)
+        elapsed = time.perf_counter() - start
+        (deep if offset else samples).append(elapsed)
+        results += len(ids)
+    print(f"First page  ({len(samples)} queries): {percentiles(samples)}")
+    if deep:
+        print(f"Later pages ({len(deep)} queries): {percentiles(deep)}")
+    print(f"Average results per page: {results / queries:.1f}")
+
+    updates = []
+    for i in range(10_000):
+        start = time.perf_counter()
+        if i % 3 == 0:
+            index.upsert(listings + i + 1, IndexedListing(random_title(rng), SaleMode.FREE, 0, None))
+        elif i % 3 == 1:
+            index.upsert(rng.randint(1, listings), IndexedListing(random_title(rng), SaleMode.FREE, 0, None))
+        else:
+            index.remove(rng.randint(1, listings))
+        updates.append(time.perf_counter() - start)
+    print(f"Upsert/remove (10000 changes): {percentiles(updates)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Usage:
+  python scripts/bench_ratelimit.py [ITERATIONS]
+
+Measures the per-request overhead of the write-endpoint rate limiter:
+  - raw bucket take() for the in-memory and shared SQLite backends
+  - a full RateLimiter.check() (user + listing buckets) inside a request context
+  - the same under 8 concurrent threads, to show lock contention stays small
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session  # noqa: E402
+
+from ratelimit import Limit, MemoryBuckets, RateLimiter, SQLiteBuckets  # noqa: E402
+
+BID_LIMITS = (Limit('user', burst=5, rate=1.0), Limit('listing', burst=50, rate=20.0))
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_backend(name, backend, iterations):
+    # Many distinct users so most calls are admitted, like real traffic
+    us = per_call_us(lambda i: backend.take(f"bid:user:u{i % 5000}", 5, 1.0), iterations)
+    print(f"{name:<28} {us:8.2f} us/take")
+
+
+def bench_check(name, limiter, iterations):
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+    with app.test_request_context('/api/listings/1/bid', method='POST'):
+        from flask import request
+        request.view_args = {'listing_id': 1}
+
+        def call(i):
+            session['user_id'] = i % 5000
+            request.view_args['listing_id'] = i % 500
+            limiter.check('place_bid', BID_LIMITS)
+
+        us = per_call_us(call, iterations)
+    print(f"{name:<28} {us:8.2f} us/request")
+
+
+def bench_threads(name, backend, iterations, threads=8):
+    per_thread = iterations // threads
+
+    def worker(t):
+        for i in range(per_thread):
+            backend.take(f"bid:user:u{t}-{i % 1000}", 5, 1.0)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed / (per_thread * threads) * 1e6:8.2f} us/take "
+          f"({threads} threads, {per_thread * threads / elapsed:,.0f} takes/s)")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    memory = MemoryBuckets()
+    bench_backend('memory take()', memory, iterations)
+    bench_threads('memory take() threaded', MemoryBuckets(), iterations)
+
+    limiter = RateLimiter()
+    bench_check('memory check() user+listing', limiter, iterations // 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_iterations = max(iterations // 20, 1000)
+        shared = SQLiteBuckets(os.path.join(tmp, 'ratelimit.sqlite3'))
+        bench_backend('sqlite take()', shared, sqlite_iterations)
+        limiter.backend = shared
+        bench_check('sqlite check() user+listing', limiter, sqlite_iterations // 2)
+
+
+if __name__ == "__main__":
+    main()
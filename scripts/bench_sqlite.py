@@ -0,0 +1,143 @@
+"""
+Usage:
+  python scripts/bench_sqlite.py [PROCESSES] [THREADS] [BIDS_PER_THREAD]
+
+Concurrent bid throughput on one file SQLite database, shaped like a gunicorn
+deployment: PROCESSES app processes (default 4) x THREADS threads (default 4) POST
+bids to 20 auctions while one more process keeps reading listings. Runs twice:
+  before - SQLITE_PROFILE=0: rollback journal, pysqlite transactions, Postgres pool options
+  after  - SQLITE_PROFILE=1: WAL, busy_timeout, synchronous=NORMAL, serialized BEGIN IMMEDIATE writer
+"outbid" is a normal 400 (a higher bid landed first); "failed" are 500s such as
+"database is locked".
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LISTINGS = 20
+
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    return f"p50 {pick(0.5):6.2f} ms  p99 {pick(0.99):7.2f} ms"
+
+
+def seed(users):
+    from app import app, db
+    from models import Listing, ListingStatus, SaleMode, User
+
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {'telegram_id': 1000 + i, 'listings_version': 0} for i in range(users + 1)
+        ])
+        for i in range(LISTINGS):
+            db.session.add(Listing(title=f'Auction {i}', sale_mode=SaleMode.AUCTION, status=ListingStatus.ACTIVE,
+                                   current_price_minor=100, bid_step_minor=1, seller_id=1))
+        db.session.commit()
+
+
+def wait_until(start_at):
+    time.sleep(max(0.0, start_at - time.time()))
+
+
+def bid_worker(process, threads, bids_per_thread, start_at):
+    from app import app
+
+    app.logger.disabled = True
+    results = {'ok': 0, 'outbid': 0, 'failed': 0, 'latency': []}
+    lock = threading.Lock()
+
+    def bidder(n):
+        user_id = 2 + process * threads + n
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        for i in range(bids_per_thread):
+            # Bids keep rising over time; ties lose to whoever commits first
+            amount = int(time.time() * 1000) % 10**9 + user_id
+            start = time.perf_counter()
+            status = client.post(f'/api/listings/{1 + (user_id + i) % LISTINGS}/bid',
+                                 json={'amount': amount}).status_code
+            elapsed = time.perf_counter() - start
+            with lock:
+                results['latency'].append(elapsed)
+                results['ok' if status == 200 else 'outbid' if status == 400 else 'failed'] += 1
+
+    workers = [threading.Thread(target=bidder, args=(n,)) for n in range(threads)]
+    wait_until(start_at)
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    print(json.dumps(results))
+
+
+def read_worker(start_at, duration):
+    from app import app
+
+    client = app.test_client()
+    latency = []
+    wait_until(start_at)
+    i = 0
+    while time.time() < start_at + duration:
+        start = time.perf_counter()
+        client.get(f'/api/listings/{1 + i % LISTINGS}?fields=countdown')
+        latency.append(time.perf_counter() - start)
+        i += 1
+    print(json.dumps({'latency': latency}))
+
+
+def bench(profile, processes, threads, bids_per_thread):
+    script = os.path.abspath(__file__)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SQLITE_PROFILE=profile, RATE_LIMIT_ENABLED='0', STATS_ENABLED='0',
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        subprocess.run([sys.executable, script, 'seed', str(processes * threads)], env=env, check=True,
+                       stderr=subprocess.DEVNULL)
+
+        start_at = time.time() + 3
+        bidders = [
+            subprocess.Popen([sys.executable, script, 'bid', str(p), str(threads), str(bids_per_thread), str(start_at)],
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            for p in range(processes)
+        ]
+        reader = subprocess.Popen([sys.executable, script, 'read', str(start_at), '5'],
+                                  env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        outputs = [json.loads(p.communicate()[0]) for p in bidders]
+        elapsed = time.time() - start_at
+        reads = json.loads(reader.communicate()[0])['latency']
+
+    totals = {key: sum(o[key] for o in outputs) for key in ('ok', 'outbid', 'failed')}
+    latency = [x for o in outputs for x in o['latency']]
+    label = 'after ' if profile == '1' else 'before'
+    print(f"{label}: {totals['ok'] / elapsed:6.1f} bids/s accepted | ok {totals['ok']}, outbid {totals['outbid']}, "
+          f"failed {totals['failed']} of {len(latency)} | bid {percentiles(latency)} | read {percentiles(reads)}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'seed':
+        return seed(int(sys.argv[2]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'bid':
+        return bid_worker(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'read':
+        return read_worker(float(sys.argv[2]), float(sys.argv[3]))
+
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    bids_per_thread = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    for profile in ('0', '1'):
+        bench(profile, processes, threads, bids_per_thread)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,18 @@
+"""
+Usage:
+  python scripts/bot_start.py
+
+Long-polling bot: /start opens the WebApp, "@<bot> <text>" inline queries search
+active listings, and /start listing_<id> (the deep link behind inline results)
+shows that listing. Search is served from an in-memory index (listing_index.py)
+that is refreshed from the database every BOT_INDEX_REFRESH_SEC seconds.
+Uses the same DATABASE_URL as the app.
+"""
+
+import gc
 import json
 import os
+import sys
 import time
 import urllib.parse
 import urllib.request
@@ -8,9 +21,15 @@ from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 API_ROOT = "https://api.telegram.org"
 DEFAULT_WEBAPP_URL = "http://127.0.0.1:5000/"
 POLL_INTERVAL_SEC = 1.0
+INLINE_PAGE_SIZE = 20
+# Telegram allows up to 50 results per page; deeper paging than this isn't useful in a popup
+INLINE_MAX_OFFSET = 500
+DEEP_LINK_PREFIX = "listing_"
 
 
 def tg_api(token: str, method: str) -> str:
@@ -41,7 +60,104 @@ def build_start_markup(webapp_url: str) -> Dict[str, Any]:
     }
 
 
-def handle_update(token: str, update: Dict[str, Any], webapp_url: str):
+def price_text(listing) -> str:
+    from models import SaleMode
+    from utils import format_price
+
+    if listing.sale_mode == SaleMode.FREE:
+        return "Бесплатно"
+    # format_price(None) is "Free", which is wrong for every other mode
+    if listing.price_minor is None:
+        if listing.sale_mode == SaleMode.AUCTION:
+            return "Аукцион"
+        if listing.sale_mode == SaleMode.NAME_YOUR_PRICE:
+            return "Предложите цену"
+        return "Цена не указана"
+    if listing.sale_mode == SaleMode.AUCTION:
+        return f"Текущая ставка: {format_price(listing.price_minor)}"
+    if listing.sale_mode == SaleMode.NAME_YOUR_PRICE:
+        return f"От {format_price(listing.price_minor)}"
+    return format_price(listing.price_minor)
+
+
+def absolute_url(webapp_url: str, url: str) -> str:
+    # Local storage serves photos from the app itself under a relative path
+    return urllib.parse.urljoin(webapp_url, url)
+
+
+def deep_link(bot_username: str, listing_id: int) -> str:
+    return f"https://t.me/{bot_username}?start={DEEP_LINK_PREFIX}{listing_id}"
+
+
+def answer_inline_query(token: str, inline_query: Dict[str, Any], ctx: Dict[str, Any]):
+    from listing_index import cover_photos, is_open
+    from storage import photo_url
+
+    index = ctx["index"]
+    try:
+        offset = min(max(int(inline_query.get("offset") or 0), 0), INLINE_MAX_OFFSET)
+    except ValueError:
+        offset = 0
+    listing_ids, has_more = index.search(inline_query.get("query", ""), offset, INLINE_PAGE_SIZE, accept=is_open)
+    photos = cover_photos(listing_ids) if listing_ids else {}
+    next_offset = offset + len(listing_ids)
+
+    results = []
+    for listing_id in listing_ids:
+        listing = index.docs[listing_id]
+        price = price_text(listing)
+        link = deep_link(ctx["bot_username"], listing_id)
+        result = {
+            "type": "article",
+            "id": str(listing_id),
+            "title": listing.title,
+            "description": price,
+            "input_message_content": {"message_text": f"{listing.title}\n{price}\n{link}"},
+            "reply_markup": {"inline_keyboard": [[{"text": "Открыть", "url": link}]]},
+        }
+        if listing_id in photos:
+            result["thumbnail_url"] = absolute_url(ctx["webapp_url"], photo_url(photos[listing_id]))
+        results.append(result)
+
+    payload = {
+        "inline_query_id": inline_query["id"],
+        "results": results,
+        # Same answer for every user, so Telegram may serve it from its cache
+        "cache_time": ctx["cache_time"],
+        "is_personal": False,
+        "next_offset": str(next_offset) if has_more and next_offset <= INLINE_MAX_OFFSET else "",
+    }
+    http_post_json(tg_api(token, "answerInlineQuery"), payload)
+
+
+def send_listing(token: str, chat_id: int, listing_id: int, ctx: Dict[str, Any]):
+    from listing_index import cover_photos, is_open
+    from storage import photo_url
+
+    listing = ctx["index"].docs.get(listing_id)
+    if listing is None or not is_open(listing):
+        http_post_json(tg_api(token, "sendMessage"), {"chat_id": chat_id, "text": "Объявление больше не активно"})
+        return
+
+    text = f"{listing.title}\n{price_text(listing)}"
+    markup = build_start_markup(ctx["webapp_url"])
+    photo = cover_photos([listing_id]).get(listing_id)
+    if photo:
+        http_post_json(tg_api(token, "sendPhoto"), {
+            "chat_id": chat_id,
+            "photo": absolute_url(ctx["webapp_url"], photo_url(photo)),
+            "caption": text,
+            "reply_markup": markup,
+        })
+    else:
+        http_post_json(tg_api(token, "sendMessage"), {"chat_id": chat_id, "text": text, "reply_markup": markup})
+
+
+def handle_update(token: str, update: Dict[str, Any], ctx: Dict[str, Any]):
+    if update.get("inline_query"):
+        answer_inline_query(token, update["inline_query"], ctx)
+        return
+
     message = update.get("message") or update.get("channel_post")
     if not message:
         return
@@ -49,8 +165,15 @@ def handle_update(token: str, update: Dict[str, Any], webapp_url: str):
     chat = message.get("chat", {})
     chat_id = chat.get("id")
     text = message.get("text", "") or ""
+    webapp_url = ctx["webapp_url"]
 
     if text.strip().lower().startswith("/start"):
+        # Deep link from an inline result: "/start listing_<id>"
+        parts = text.split(maxsplit=1)
+        argument = parts[1].strip() if len(parts) > 1 else ""
+        if argument.startswith(DEEP_LINK_PREFIX) and argument[len(DEEP_LINK_PREFIX):].isdigit():
+            send_listing(token, chat_id, int(argument[len(DEEP_LINK_PREFIX):]), ctx)
+            return
         payload = {
             "chat_id": chat_id,
             "text": "Приложение для создания объявлений",
@@ -69,11 +192,39 @@ def run_bot():
     webapp_url = os.environ.get("WEBAPP_URL", DEFAULT_WEBAPP_URL)
     print(f"Using WEBAPP_URL: {webapp_url}")
 
+    from app import app
+    from listing_index import ActiveListingIndex
+
+    refresh_sec = float(os.environ.get("BOT_INDEX_REFRESH_SEC", "5"))
+    me = http_get(tg_api(token, "getMe")).get("result", {})
+    ctx: Dict[str, Any] = {
+        "webapp_url": webapp_url,
+        "bot_username": me.get("username", ""),
+        "cache_time": int(os.environ.get("BOT_INLINE_CACHE_SEC", "30")),
+        "index": ActiveListingIndex(),
+    }
+    with app.app_context():
+        print(f"Indexed {ctx['index'].load()} active listings")
+    # The index is millions of long-lived objects; keep full GC passes from walking them
+    gc.freeze()
+    refreshed_at = time.monotonic()
+    # Don't let a quiet long poll delay index refreshes
+    poll_timeout = max(1, min(25, int(refresh_sec)))
+
     offset: Optional[int] = None
     print("Bot polling started. Press Ctrl+C to stop.")
     while True:
         try:
-            resp = http_get(tg_api(token, "getUpdates"), {"timeout": 25, "offset": offset} if offset else {"timeout": 25})
+            if time.monotonic() - refreshed_at >= refresh_sec:
+                with app.app_context():
+                    ctx["index"].refresh()
+                gc.freeze()
+                refreshed_at = time.monotonic()
+
+            params = {"timeout": poll_timeout, "allowed_updates": json.dumps(["message", "channel_post", "inline_query"])}
+            if offset:
+                params["offset"] = offset
+            resp = http_get(tg_api(token, "getUpdates"), params)
             if not resp.get("ok"):
                 print("getUpdates error:", resp)
                 time.sleep(POLL_INTERVAL_SEC)
@@ -82,7 +233,8 @@ def run_bot():
             updates: List[Dict[str, Any]] = resp.get("result", [])
             for upd in updates:
                 offset = max(offset or 0, upd.get("update_id", 0) + 1)
-                handle_update(token, upd, webapp_url)
+                with app.app_context():
+                    handle_update(token, upd, ctx)
 
         except KeyboardInterrupt:
             print("\nBot stopped by user.")
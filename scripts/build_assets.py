@@ -0,0 +1,119 @@
+"""
+Usage:
+  python scripts/build_assets.py
+
+Minifies and fingerprints static/css/telegram-theme.css, static/js/telegram-webapp.js
+and static/js/main.js into static/dist/, writes .gz (and .br when the `brotli` package
+is installed) variants next to each file, and a manifest.json used by templates
+(asset_url) to reference the hashed URLs. Served by /assets/<file> with immutable
+cache headers. Run again after editing any of the sources.
+
+Optional build-only packages for better output:
+  pip install rjsmin rcssmin brotli
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assets import ASSET_SOURCES, ASSET_DIST_DIR, MANIFEST_NAME  # noqa: E402
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(ROOT, "static")
+DIST_DIR = os.path.join(STATIC_DIR, ASSET_DIST_DIR)
+
+
+def minify_js(source: str) -> str:
+    if rjsmin:
+        return rjsmin.jsmin(source)
+    # Conservative fallback: drop indentation, blank lines and full-line // comments
+    lines = []
+    for line in source.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines) + "\n"
+
+
+def minify_css(source: str) -> str:
+    if rcssmin:
+        return rcssmin.cssmin(source)
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    return source.replace(";}", "}").strip() + "\n"
+
+
+def fingerprinted_name(path: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+
+def write_variants(path: str, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+    with gzip.open(path + ".gz", "wb", compresslevel=9) as f:
+        f.write(content)
+    if brotli:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(content, quality=11))
+
+
+def main():
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for source in ASSET_SOURCES:
+        with open(os.path.join(STATIC_DIR, source), encoding="utf-8") as f:
+            text = f.read()
+        minified = (minify_css(text) if source.endswith(".css") else minify_js(text)).encode("utf-8")
+
+        target = fingerprinted_name(source, minified)
+        target_path = os.path.join(DIST_DIR, target)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        write_variants(target_path, minified)
+        manifest[source] = target
+
+        sizes = [f"{len(text.encode('utf-8'))} -> {len(minified)}",
+                 f"gz {os.path.getsize(target_path + '.gz')}"]
+        if brotli:
+            sizes.append(f"br {os.path.getsize(target_path + '.br')}")
+        print(f"{source} -> {ASSET_DIST_DIR}/{target} ({', '.join(sizes)} bytes)")
+
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if not rjsmin or not rcssmin:
+        print("NOTE: rjsmin/rcssmin not installed, used basic minification")
+    if not brotli:
+        print("NOTE: brotli not installed, skipped .br variants")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
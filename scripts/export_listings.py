@@ -0,0 +1,64 @@
+"""
+Usage:
+  python scripts/export_listings.py (--seller-id ID | --telegram-id TG_ID)
+                                    [--format ndjson|csv] [--cursor CURSOR] [--gzip] [-o FILE]
+
+Streams a seller's full history (listings incl. archived ones, photo URLs, bids) to
+FILE or stdout, in the same format as GET /api/export. Memory use is constant; to
+continue an interrupted export, pass the `cursor` of the last record written
+(with -o, the file is appended to). Uses the same DATABASE_URL as the app.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    who = parser.add_mutually_exclusive_group(required=True)
+    who.add_argument("--seller-id", type=int)
+    who.add_argument("--telegram-id", type=int)
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--cursor", help="resume after this record")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    from app import app
+    from models import User
+    from export import ExportCursorError, encode_export, gzip_chunks, iter_export_records, parse_cursor
+
+    try:
+        parse_cursor(args.cursor)
+    except ExportCursorError as e:
+        parser.error(str(e))
+
+    with app.app_context():
+        seller_id = args.seller_id
+        if seller_id is None:
+            user = User.query.filter_by(telegram_id=args.telegram_id).first()
+            if user is None:
+                parser.error(f"No user with telegram id {args.telegram_id}")
+            seller_id = user.id
+
+        chunks = encode_export(iter_export_records(seller_id, args.cursor), args.format, header=not args.cursor)
+        if args.gzip:
+            # Appending a new gzip member to an existing .gz file is still a valid gzip stream
+            chunks = gzip_chunks(chunks)
+
+        out = open(args.output, "ab" if args.cursor else "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+            else:
+                out.flush()
+
+
+if __name__ == "__main__":
+    main()
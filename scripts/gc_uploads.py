@@ -0,0 +1,71 @@
+"""
+Usage:
+  python scripts/gc_uploads.py [--dry-run] [--verbose] [--only orphans|drafts|staging]
+                               [--grace-hours N] [--draft-days N] [--rate FILES_PER_SEC]
+                               [--batch-size N]
+
+Reclaims upload storage:
+  drafts   - DRAFT listings older than GC_DRAFT_MAX_AGE_DAYS, with their photo files
+  staging  - resumable uploads with no activity for RESUMABLE_UPLOAD_TTL
+  orphans  - stored files no (hot or archived) ListingPhoto references, older than
+             GC_ORPHAN_GRACE_HOURS: deleted listings, abandoned direct uploads, failed saves
+Walks storage as a stream and checks keys against the database in batches, so memory
+stays flat with millions of files. Deletions are paced to GC_DELETE_RATE files/s.
+Safe to run from cron while the app is serving; uses the same DATABASE_URL as the app.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    from app import app
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed")
+    parser.add_argument("--verbose", action="store_true", help="print every key/draft")
+    parser.add_argument("--only", choices=("orphans", "drafts", "staging"))
+    parser.add_argument("--grace-hours", type=float, default=app.config['GC_ORPHAN_GRACE_HOURS'])
+    parser.add_argument("--draft-days", type=int, default=app.config['GC_DRAFT_MAX_AGE_DAYS'])
+    parser.add_argument("--rate", type=float, default=app.config['GC_DELETE_RATE'],
+                        help="max file deletions per second (0 = unlimited)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="keys checked per query")
+    args = parser.parse_args()
+
+    # Upload windows: presign tickets stay valid for 2 x DIRECT_UPLOAD_EXPIRES
+    min_grace = 2 * app.config['DIRECT_UPLOAD_EXPIRES'] / 3600
+    if args.grace_hours < min_grace:
+        parser.error(f"--grace-hours must be at least {min_grace:g} (upload ticket lifetime)")
+
+    from routes import upload_store
+    from storage import get_storage
+    from upload_gc import DeletePacer, collect_orphaned_uploads, purge_abandoned_drafts
+
+    log = print if args.verbose else None
+    prefix = "[dry-run] " if args.dry_run else ""
+    storage = get_storage()
+    pacer = DeletePacer(args.rate)
+
+    with app.app_context():
+        # Drafts first: their photos would otherwise wait another run as orphans
+        if args.only in (None, "drafts"):
+            listings, files = purge_abandoned_drafts(
+                storage, args.draft_days, pacer, dry_run=args.dry_run, log=log
+            )
+            print(f"{prefix}drafts: {listings} listings, {files} photo files")
+        if args.only in (None, "staging"):
+            stale = upload_store.purge_stale(app.config['RESUMABLE_UPLOAD_TTL'], dry_run=args.dry_run)
+            print(f"{prefix}staging: {stale} stale resumable uploads")
+        if args.only in (None, "orphans"):
+            orphans = collect_orphaned_uploads(
+                storage, args.grace_hours * 3600, pacer,
+                dry_run=args.dry_run, batch_size=args.batch_size, log=log
+            )
+            print(f"{prefix}orphans: {orphans} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Usage:
+  python scripts/migrate_add_columns.py [--dry-run]
+
+db.create_all() creates missing tables but never alters existing ones. This script
+compares the models with the live database and adds any missing columns and
+indexes (columns are added as nullable, with their server default if one is set).
+Uses the same DATABASE_URL as the app.
+"""
+
+import os
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv[1:]
+
+    from app import app, db
+
+    with app.app_context():
+        engine = db.engine
+        inspector = inspect(engine)
+        statements = []
+
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                statements.append(ddl)
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    statements.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+
+        if not statements:
+            print("Schema is up to date")
+            return
+
+        for ddl in statements:
+            print(("[dry-run] " if dry_run else "") + ddl)
+        if dry_run:
+            return
+
+        with engine.begin() as conn:
+            for ddl in statements:
+                conn.execute(text(ddl))
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
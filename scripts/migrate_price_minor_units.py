@@ -0,0 +1,97 @@
+"""
+Usage:
+  python scripts/migrate_price_minor_units.py
+
+Converts legacy Numeric(10, 2) price columns into integer minor units (agorot/cents):
+  listing.fixed_price   -> listing.fixed_price_minor
+  listing.start_price   -> listing.start_price_minor
+  listing.min_price     -> listing.min_price_minor
+  listing.current_price -> listing.current_price_minor
+  listing.bid_step      -> listing.bid_step_minor
+  bid.amount            -> bid.amount_minor
+and backfills the indexed listing.effective_price_minor column.
+
+Safe to run more than once: columns that are already migrated are skipped.
+Reads DATABASE_URL from environment/.env (defaults to sqlite:///instance/auction.db,
+which is where Flask-SQLAlchemy puts the default sqlite:///auction.db).
+"""
+
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, inspect, text
+
+DEFAULT_URL = "sqlite:///instance/auction.db"
+
+PRICE_COLUMNS = {
+    "listing": ["fixed_price", "start_price", "min_price", "current_price", "bid_step"],
+    "bid": ["amount"],
+}
+
+
+def migrate_column(conn, table: str, column: str, existing: set, is_sqlite: bool):
+    new_column = f"{column}_minor"
+    if new_column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {new_column} BIGINT"))
+        print(f"  added {table}.{new_column}")
+    if column not in existing:
+        return
+
+    conn.execute(text(
+        f"UPDATE {table} SET {new_column} = CAST(ROUND({column} * 100) AS BIGINT) "
+        f"WHERE {column} IS NOT NULL AND {new_column} IS NULL"
+    ))
+    conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+    print(f"  migrated {table}.{column} -> {table}.{new_column}")
+
+    if table == "bid" and not is_sqlite:
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {new_column} SET NOT NULL"))
+
+
+def backfill_effective_price(conn, existing: set):
+    if "effective_price_minor" not in existing:
+        conn.execute(text("ALTER TABLE listing ADD COLUMN effective_price_minor BIGINT"))
+        print("  added listing.effective_price_minor")
+
+    # Enum columns store member names (FIXED_PRICE, AUCTION, ...)
+    conn.execute(text(
+        "UPDATE listing SET effective_price_minor = CASE sale_mode "
+        "WHEN 'FIXED_PRICE' THEN fixed_price_minor "
+        "WHEN 'AUCTION' THEN current_price_minor "
+        "WHEN 'NAME_YOUR_PRICE' THEN min_price_minor "
+        "WHEN 'FREE' THEN 0 END"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_listing_status_effective_price "
+        "ON listing (status, effective_price_minor)"
+    ))
+    print("  backfilled listing.effective_price_minor")
+
+
+def main():
+    load_dotenv()
+    url = os.environ.get("DATABASE_URL", DEFAULT_URL)
+    engine = create_engine(url)
+    is_sqlite = engine.dialect.name == "sqlite"
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        for table, columns in PRICE_COLUMNS.items():
+            if table not in tables:
+                print(f"Skipping {table}: table does not exist")
+                continue
+            print(f"Migrating {table}")
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for column in columns:
+                migrate_column(conn, table, column, existing, is_sqlite)
+
+        if "listing" in tables:
+            existing = {c["name"] for c in inspect(conn).get_columns("listing")}
+            backfill_effective_price(conn, existing)
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
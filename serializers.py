@@ -0,0 +1,163 @@
+from functools import lru_cache
+from sqlalchemy import select, desc
+from app import db
+from models import User, Listing, ListingPhoto, Bid, SaleMode, ArchivedListingPhoto, ArchivedBid
+from utils import minor_to_major, calculate_time_remaining
+from storage import photo_url
+
+# Listing columns each public field needs. Relationship-backed fields
+# (photos, bids, seller_name) are fetched with one extra query each, and only when requested.
+LISTING_FIELD_COLUMNS = {
+    'id': ('id',),
+    'title': ('title',),
+    'description': ('description',),
+    'sale_mode': ('sale_mode',),
+    'current_price': ('current_price_minor',),
+    'price': ('effective_price_minor',),
+    'status': ('status',),
+    'end_time': ('end_time',),
+    'time_remaining': ('sale_mode', 'end_time'),
+    'photos': (),
+    'bids': ('seller_id',),
+    'seller_name': ('seller_id',),
+    'is_owner': ('seller_id',),
+}
+
+# Named shapes for the common clients; usable anywhere a field name is
+LISTING_PROJECTIONS = {
+    'full': ('id', 'title', 'description', 'sale_mode', 'current_price', 'status',
+             'photos', 'bids', 'time_remaining', 'seller_name', 'is_owner'),
+    'summary': ('id', 'title', 'sale_mode', 'price', 'status'),
+    'card': ('id', 'title', 'sale_mode', 'price', 'status', 'photos'),
+    'countdown': ('id', 'current_price', 'status', 'time_remaining'),
+}
+
+
+def parse_listing_fields(raw, default='full'):
+    """Parse a `fields=` query value into an ordered tuple of field names.
+    Accepts field names and projection names (e.g. "countdown" or "id,title,photos").
+    Returns None if any name is unknown.
+    """
+    names = [name.strip() for name in (raw or default).split(',') if name.strip()]
+    fields = []
+    for name in names:
+        expanded = LISTING_PROJECTIONS.get(name, (name,))
+        for field in expanded:
+            if field not in LISTING_FIELD_COLUMNS:
+                return None
+            if field not in fields:
+                fields.append(field)
+    return tuple(fields) or None
+
+
+@lru_cache(maxsize=64)
+def listing_columns(fields, model=Listing):
+    """Column attributes to select for a field tuple (always includes the primary key).
+    `model` may be ArchivedListing, which has the same column names.
+    """
+    names = ['id']
+    for field in fields:
+        for column in LISTING_FIELD_COLUMNS[field]:
+            if column not in names:
+                names.append(column)
+    return tuple(getattr(model, name) for name in names)
+
+
+def select_listings(fields, model=Listing):
+    """Core SELECT of only the columns needed for `fields` (no ORM identity overhead)"""
+    return select(*listing_columns(fields, model))
+
+
+def _photos_by_listing(listing_ids, archived=False):
+    Photo = ArchivedListingPhoto if archived else ListingPhoto
+    rows = db.session.execute(
+        select(Photo.listing_id, Photo.filename, Photo.order)
+        .where(Photo.listing_id.in_(listing_ids))
+        .order_by(Photo.listing_id, Photo.order)
+    )
+    result = {}
+    for row in rows:
+        result.setdefault(row.listing_id, []).append(
+            {'url': photo_url(row.filename), 'order': row.order}
+        )
+    return result
+
+
+def _bids_by_listing(listing_rows, viewer_id, archived=False):
+    # Private bids are only visible to the seller of the listing
+    owned = {row.id for row in listing_rows if row.seller_id == viewer_id}
+    BidModel = ArchivedBid if archived else Bid
+    rows = db.session.execute(
+        select(BidModel.listing_id, BidModel.amount_minor, BidModel.message, BidModel.created_at,
+               BidModel.is_private, User.first_name, User.username)
+        .join(User, User.id == BidModel.bidder_id)
+        .where(BidModel.listing_id.in_([row.id for row in listing_rows]))
+        .order_by(desc(BidModel.created_at))
+    )
+    result = {}
+    for row in rows:
+        if row.is_private and row.listing_id not in owned:
+            continue
+        result.setdefault(row.listing_id, []).append({
+            'amount': minor_to_major(row.amount_minor),
+            'message': row.message,
+            'created_at': row.created_at.isoformat(),
+            'bidder_name': row.first_name or row.username or 'Anonymous'
+        })
+    return result
+
+
+def _seller_names(seller_ids):
+    rows = db.session.execute(
+        select(User.id, User.first_name, User.username).where(User.id.in_(seller_ids))
+    )
+    return {row.id: row.first_name or row.username for row in rows}
+
+
+def _time_remaining(row):
+    if row.sale_mode == SaleMode.AUCTION and row.end_time:
+        return calculate_time_remaining(row.end_time)
+    return None
+
+
+# Scalar field serializers operating on a selected Row
+_SCALAR_SERIALIZERS = {
+    'id': lambda row: row.id,
+    'title': lambda row: row.title,
+    'description': lambda row: row.description,
+    'sale_mode': lambda row: row.sale_mode.value,
+    'current_price': lambda row: minor_to_major(row.current_price_minor),
+    'price': lambda row: minor_to_major(row.effective_price_minor),
+    'status': lambda row: row.status.value if row.status else None,
+    'end_time': lambda row: row.end_time.isoformat() if row.end_time else None,
+    'time_remaining': _time_remaining,
+}
+
+
+def serialize_listing_rows(rows, fields, viewer_id=None, archived=False):
+    """Serialize rows from select_listings(fields) into dicts with exactly `fields`.
+    Relationship fields are batch-loaded for all rows at once. Pass archived=True
+    for rows selected from ArchivedListing.
+    """
+    if not rows:
+        return []
+
+    listing_ids = [row.id for row in rows]
+    photos = _photos_by_listing(listing_ids, archived) if 'photos' in fields else None
+    bids = _bids_by_listing(rows, viewer_id, archived) if 'bids' in fields else None
+    sellers = _seller_names({row.seller_id for row in rows}) if 'seller_name' in fields else None
+
+    scalars = [(field, _SCALAR_SERIALIZERS[field]) for field in fields if field in _SCALAR_SERIALIZERS]
+    result = []
+    for row in rows:
+        item = {field: serialize(row) for field, serialize in scalars}
+        if photos is not None:
+            item['photos'] = photos.get(row.id, [])
+        if bids is not None:
+            item['bids'] = bids.get(row.id, [])
+        if sellers is not None:
+            item['seller_name'] = sellers.get(row.seller_id)
+        if 'is_owner' in fields:
+            item['is_owner'] = viewer_id == row.seller_id
+        result.append(item)
+    return result
@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized per process only
+    fcntl = None
+
+# Set while the current thread holds the writer lock; the engine's "begin" hook then
+# opens the transaction with BEGIN IMMEDIATE instead of a deferred BEGIN.
+_writing = ContextVar('sqlite_writing', default=False)
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def sqlite_engine_options(pool_size=10, busy_timeout_ms=5000):
+    """Engine options for a file-backed SQLite database shared by a threaded server.
+    pool_recycle/pool_pre_ping are pointless for a local file; connections are
+    reused across threads, so the pysqlite same-thread check is turned off.
+    """
+    return {
+        'pool_size': pool_size,
+        'max_overflow': pool_size,
+        'connect_args': {'check_same_thread': False, 'timeout': busy_timeout_ms / 1000},
+    }
+
+
+class FairLock:
+    """FIFO lock: writers are served in arrival order, and a release wakes only the
+    next waiter (no thundering herd), so no request starves under load"""
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._waiters = deque()
+        self._held = False
+
+    def acquire(self):
+        with self._mutex:
+            if not self._held:
+                self._held = True
+                return
+            turn = threading.Event()
+            self._waiters.append(turn)
+        # Ownership is handed over directly by release()
+        turn.wait()
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._held = False
+
+
+class SQLiteWriter:
+    """Serializes write transactions within a process and makes them BEGIN IMMEDIATE.
+
+    WAL lets any number of readers run alongside one writer. Taking the write lock
+    up front (instead of upgrading a read transaction, which SQLite answers with an
+    immediate "database is locked") means writers queue here in order, and writers
+    in other processes wait via busy_timeout. Does nothing unless installed on a
+    SQLite engine.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.session = None
+        self._lock = FairLock()
+        self._lock_file = None
+
+    def install(self, engine, session=None, journal_mode='WAL', synchronous='NORMAL', busy_timeout_ms=5000):
+        """Configure `engine`. `session` (a scoped session) is rolled back when the writer
+        slot is released, so no write lock outlives it (e.g. a refresh after commit)."""
+        self.enabled = True
+        self.session = session
+        database = engine.url.database
+        if fcntl is not None and database:
+            # Host-wide queue between worker processes: a blocking flock wakes the next
+            # writer as soon as the slot frees, instead of SQLite's sleep-and-retry busy handler
+            self._lock_file = os.path.abspath(database) + '-writer.lock'
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            # Take over transaction control from pysqlite so we can choose the BEGIN flavour
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+            cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+            cursor.close()
+
+        @event.listens_for(engine, 'begin')
+        def _on_begin(connection):
+            connection.exec_driver_sql('BEGIN IMMEDIATE' if _writing.get() else 'BEGIN')
+
+    @contextmanager
+    def transaction(self):
+        """Hold the writer slot for the enclosed block; reentrant. The caller must not
+        have a read transaction open yet (commit or roll back first), and must commit
+        inside the block: anything uncommitted is rolled back on exit."""
+        if not self.enabled or _writing.get():
+            yield
+            return
+        self._lock.acquire()
+        fd = self._acquire_host_lock()
+        token = _writing.set(True)
+        try:
+            yield
+        finally:
+            try:
+                if self.session is not None:
+                    self.session.rollback()
+            finally:
+                _writing.reset(token)
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                self._lock.release()
+
+    def _acquire_host_lock(self):
+        if self._lock_file is None:
+            return None
+        # One descriptor per process (flock locks belong to the open file); reopened after fork
+        if getattr(self, '_fd_pid', None) != os.getpid():
+            self._fd = os.open(self._lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+            self._fd_pid = os.getpid()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self._fd
+
+    def serialized(self, view):
+        """Decorator for write endpoints: run the whole view as the single writer"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with self.transaction():
+                return view(*args, **kwargs)
+        return wrapper
+
+
+sqlite_writer = SQLiteWriter()
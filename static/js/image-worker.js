@@ -0,0 +1,26 @@
+// Image downscaling worker: decodes and re-encodes photos off the main thread
+// Message in:  { id, file, maxDimension, quality, type }
+// Message out: { id, blob, width, height } or { id, error }
+
+self.onmessage = async (event) => {
+    const { id, file, maxDimension, quality, type } = event.data;
+    try {
+        // Respect EXIF orientation so the encoded pixels are upright (the output has no EXIF)
+        const bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+        const scale = Math.min(1, maxDimension / Math.max(bitmap.width, bitmap.height));
+        const width = Math.round(bitmap.width * scale);
+        const height = Math.round(bitmap.height * scale);
+
+        const canvas = new OffscreenCanvas(width, height);
+        const ctx = canvas.getContext('2d');
+        ctx.imageSmoothingEnabled = true;
+        ctx.imageSmoothingQuality = 'high';
+        ctx.drawImage(bitmap, 0, 0, width, height);
+        bitmap.close();
+
+        const blob = await canvas.convertToBlob({ type, quality });
+        self.postMessage({ id, blob, width, height });
+    } catch (error) {
+        self.postMessage({ id, error: String(error) });
+    }
+};
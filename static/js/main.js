@@ -106,7 +106,9 @@ async function apiCall(url, options = {}) {
         });
 
         if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+            const error = new Error(`HTTP error! status: ${response.status}`);
+            error.status = response.status;
+            throw error;
         }
 
         const data = await response.json();
@@ -584,15 +586,259 @@ async function saveDraft() {
 }
 
 async function uploadPhotos(listingId) {
-    const formData = new FormData();
+    // Only upload newly added files (prefilled existing photos have no file object)
+    const files = uploadedPhotos.filter(photo => photo.file).map(photo => photo.file);
+    const uploaded = [];
+    
+    for (const original of files) {
+        const file = await prepareImageForUpload(original);
+        try {
+            uploaded.push(...await uploadPhoto(listingId, file));
+        } catch (error) {
+            // Only a server without direct/chunked upload endpoints gets the multipart fallback.
+            // Anything else (rate limits, a rejected image, a failure after /complete may have
+            // saved the photo) must not be retried around the limits or duplicated.
+            if (error.status !== 404 && error.status !== 405) throw error;
+            console.warn('Upload endpoints unavailable, falling back to multipart:', error);
+            uploaded.push(...await uploadPhotosMultipart(listingId, [file]));
+        }
+    }
+    
+    return { success: true, photos: uploaded };
+}
+
+const UPLOAD_MAX_RETRIES = 8;
+
+// Client-side downscaling: server target size and quality, overridable from the page
+const PHOTO_UPLOAD_CONFIG = {
+    maxDimension: 1280,
+    quality: 0.85,
+    type: 'image/jpeg',
+    // Files already this small and within maxDimension are sent untouched
+    passthroughBytes: 300 * 1024,
+    workerUrl: '/static/js/image-worker.js',
+    // 's3': bytes go straight to object storage; 'local': chunked upload via the app
+    storageBackend: 'local',
+    ...(window.__PHOTO_UPLOAD_CONFIG__ || {})
+};
+
+let imageWorker = null;
+let imageWorkerSeq = 0;
+let imageWorkerIdleTimer = null;
+const imageWorkerJobs = new Map();
+// A job that takes longer than this is treated as a hung worker
+const IMAGE_WORKER_JOB_TIMEOUT_MS = 20000;
+// The worker is terminated after this long without jobs and recreated on demand
+const IMAGE_WORKER_IDLE_MS = 30000;
+
+function getImageWorker() {
+    if (imageWorker !== null) return imageWorker;
+    imageWorker = false;
+    if (typeof Worker !== 'undefined' && typeof OffscreenCanvas !== 'undefined' && typeof createImageBitmap !== 'undefined') {
+        try {
+            imageWorker = new Worker(PHOTO_UPLOAD_CONFIG.workerUrl);
+            imageWorker.onmessage = (event) => {
+                const job = imageWorkerJobs.get(event.data.id);
+                if (!job) return;
+                clearTimeout(job.timer);
+                imageWorkerJobs.delete(event.data.id);
+                scheduleImageWorkerIdle();
+                if (event.data.error) job.reject(new Error(event.data.error));
+                else job.resolve(event.data);
+            };
+            // Script failed to load (404, CSP) or crashed: nothing will ever answer
+            imageWorker.onerror = (event) => {
+                event.preventDefault?.();
+                failImageWorker(new Error(`Image worker error: ${event.message || 'failed to load'}`));
+            };
+            imageWorker.onmessageerror = () => failImageWorker(new Error('Image worker message could not be decoded'));
+        } catch (error) {
+            console.warn('Image worker unavailable, resizing on main thread:', error);
+            imageWorker = false;
+        }
+    }
+    return imageWorker;
+}
+
+// Drop a broken worker for the rest of the page and reject everything it still owes
+function failImageWorker(error) {
+    clearTimeout(imageWorkerIdleTimer);
+    if (imageWorker) imageWorker.terminate();
+    imageWorker = false;
+    for (const job of imageWorkerJobs.values()) {
+        clearTimeout(job.timer);
+        job.reject(error);
+    }
+    imageWorkerJobs.clear();
+}
+
+function scheduleImageWorkerIdle() {
+    clearTimeout(imageWorkerIdleTimer);
+    if (imageWorkerJobs.size > 0) return;
+    imageWorkerIdleTimer = setTimeout(() => {
+        if (imageWorker && imageWorkerJobs.size === 0) {
+            imageWorker.terminate();
+            imageWorker = null;
+        }
+    }, IMAGE_WORKER_IDLE_MS);
+}
+
+function resizeInWorker(worker, file) {
+    return new Promise((resolve, reject) => {
+        const id = ++imageWorkerSeq;
+        clearTimeout(imageWorkerIdleTimer);
+        const timer = setTimeout(() => failImageWorker(new Error('Image worker timed out')), IMAGE_WORKER_JOB_TIMEOUT_MS);
+        imageWorkerJobs.set(id, { resolve, reject, timer });
+        worker.postMessage({
+            id,
+            file,
+            maxDimension: PHOTO_UPLOAD_CONFIG.maxDimension,
+            quality: PHOTO_UPLOAD_CONFIG.quality,
+            type: PHOTO_UPLOAD_CONFIG.type
+        });
+    });
+}
+
+async function resizeOnMainThread(file) {
+    const url = URL.createObjectURL(file);
+    try {
+        const img = await new Promise((resolve, reject) => {
+            const el = new Image();
+            el.onload = () => resolve(el);
+            el.onerror = () => reject(new Error('Could not decode image'));
+            el.src = url;
+        });
+        const scale = Math.min(1, PHOTO_UPLOAD_CONFIG.maxDimension / Math.max(img.naturalWidth, img.naturalHeight));
+        const canvas = document.createElement('canvas');
+        canvas.width = Math.round(img.naturalWidth * scale);
+        canvas.height = Math.round(img.naturalHeight * scale);
+        const ctx = canvas.getContext('2d');
+        ctx.imageSmoothingQuality = 'high';
+        ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
+        const blob = await new Promise(resolve => canvas.toBlob(resolve, PHOTO_UPLOAD_CONFIG.type, PHOTO_UPLOAD_CONFIG.quality));
+        return { blob, width: canvas.width, height: canvas.height };
+    } finally {
+        URL.revokeObjectURL(url);
+    }
+}
+
+// Downscale and re-encode a photo to the server's target size before upload.
+// Falls back to the original file if anything goes wrong.
+async function prepareImageForUpload(file) {
+    if (!file.type.startsWith('image/') || file.type === 'image/gif') return file;
+    if (file.size <= PHOTO_UPLOAD_CONFIG.passthroughBytes && file.type === PHOTO_UPLOAD_CONFIG.type) return file;
+    
+    try {
+        let result = null;
+        const worker = getImageWorker();
+        if (worker) {
+            try {
+                result = await resizeInWorker(worker, file);
+            } catch (error) {
+                console.warn('Image worker failed, resizing on main thread:', error);
+            }
+        }
+        if (!result) result = await resizeOnMainThread(file);
+        if (!result.blob || result.blob.size >= file.size) return file;
+        
+        const ext = PHOTO_UPLOAD_CONFIG.type === 'image/webp' ? 'webp' : 'jpg';
+        const name = file.name.replace(/\.[^.]+$/, '') + '.' + ext;
+        return new File([result.blob], name, { type: PHOTO_UPLOAD_CONFIG.type });
+    } catch (error) {
+        console.warn('Image downscaling failed, uploading original:', error);
+        return file;
+    }
+}
+
+async function uploadPhoto(listingId, file) {
+    if (PHOTO_UPLOAD_CONFIG.storageBackend !== 's3') {
+        return uploadPhotoResumable(listingId, file);
+    }
+    const presign = await apiCall(`/api/listings/${listingId}/photos/presign`, {
+        method: 'POST',
+        body: JSON.stringify({
+            filename: file.name,
+            content_type: file.type || 'image/jpeg',
+            size: file.size
+        })
+    });
+    return uploadPhotoDirect(listingId, file, presign);
+}
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+// Chunked, resumable upload: a dropped connection only costs the current chunk.
+// After a failure we ask the server which bytes it has and continue from there.
+async function uploadPhotoResumable(listingId, file) {
+    const init = await apiCall(`/api/listings/${listingId}/uploads`, {
+        method: 'POST',
+        body: JSON.stringify({
+            filename: file.name,
+            content_type: file.type || 'image/jpeg',
+            size: file.size
+        })
+    });
     
-    // Only append newly added files (prefilled existing photos have no file object)
-    let idx = 0;
-    uploadedPhotos.forEach((photo) => {
-        if (photo.file) {
-            formData.append(`photo_${idx++}`, photo.file);
+    const uploadUrl = `${__getApiBase()}/api/uploads/${init.upload_id}`;
+    const chunkSize = init.chunk_size;
+    let offset = init.offset || 0;
+    let failures = 0;
+    
+    while (offset < file.size) {
+        const end = Math.min(offset + chunkSize, file.size);
+        try {
+            const response = await fetch(uploadUrl, {
+                method: 'PUT',
+                credentials: 'include',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                    'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+                    ...window.tgWebApp?.getAuthHeaders?.()
+                },
+                body: file.slice(offset, end)
+            });
+            if (!response.ok) throw new Error(`Chunk upload failed: ${response.status}`);
+            offset = (await response.json()).offset;
+            failures = 0;
+        } catch (error) {
+            if (++failures > UPLOAD_MAX_RETRIES) throw error;
+            await sleep(Math.min(1000 * 2 ** (failures - 1), 15000));
+            try {
+                offset = (await apiCall(`/api/uploads/${init.upload_id}`)).offset;
+            } catch (statusError) {
+                // Keep the last known offset and retry the chunk
+            }
         }
+    }
+    
+    const result = await apiCall(`/api/uploads/${init.upload_id}/complete`, { method: 'POST' });
+    return result.photos || [];
+}
+
+// Direct upload: send bytes straight to storage with the presigned POST, then record metadata
+async function uploadPhotoDirect(listingId, file, presign) {
+    const upload = presign.upload;
+    // S3 presigned POST: policy fields first, file last
+    const formData = new FormData();
+    Object.entries(upload.fields || {}).forEach(([key, value]) => formData.append(key, value));
+    formData.append('file', file);
+    const response = await fetch(upload.url, { method: 'POST', body: formData });
+    if (!response.ok) {
+        throw new Error(`Storage upload failed: ${response.status}`);
+    }
+    
+    const result = await apiCall(`/api/listings/${listingId}/photos/complete`, {
+        method: 'POST',
+        body: JSON.stringify({ upload_id: presign.upload_id })
     });
+    return result.photos || [];
+}
+
+async function uploadPhotosMultipart(listingId, files) {
+    const formData = new FormData();
+    files.forEach((file, idx) => formData.append(`photo_${idx}`, file));
     
     const base = __getApiBase();
     const response = await fetch(`${base}/api/listings/${listingId}/photos`, {
@@ -609,7 +855,8 @@ async function uploadPhotos(listingId) {
         throw new Error('Photo upload failed');
     }
     
-    return await response.json();
+    const result = await response.json();
+    return result.photos || [];
 }
 
 // Create listing initialization
@@ -663,6 +910,7 @@ function initMyListings() {
             if (e.target.checked) {
                 const status = e.target.id.replace('filter', '').toLowerCase();
                 const url = new URL(window.location);
+                url.searchParams.delete('page');
                 if (status === 'all') {
                     url.searchParams.delete('status');
                 } else {
@@ -0,0 +1,167 @@
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, union_all
+from app import db
+from sqlite_profile import sqlite_writer
+from models import Listing, ArchivedListing, ListingDailyStats, SellerDailyStats
+
+COUNTERS = ('views', 'impressions', 'bids')
+
+
+def _upsert(model, rows, key_columns):
+    """INSERT ... ON CONFLICT DO UPDATE adding the counters (SQLite and PostgreSQL)"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Stats upsert not supported on {dialect}")
+    table = model.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS}
+    )
+    db.session.execute(statement, rows)
+
+
+def _seller_ids(listing_ids):
+    rows = db.session.execute(union_all(
+        select(Listing.id, Listing.seller_id).where(Listing.id.in_(listing_ids)),
+        select(ArchivedListing.id, ArchivedListing.seller_id).where(ArchivedListing.id.in_(listing_ids)),
+    ))
+    return dict(rows.all())
+
+
+class StatsCounter:
+    """Per-worker accumulator for listing views, impressions and bids.
+
+    record() only bumps an in-memory counter; a background thread writes the
+    totals every `interval` seconds as one batched upsert into the daily rollup
+    tables, so reads never turn into row writes. Up to `interval` seconds of
+    counts can be lost if the process is killed (they are flushed on normal exit).
+    """
+
+    def __init__(self, app=None, interval=10):
+        self.app = app
+        self.interval = interval
+        self.enabled = True
+        self._pending = defaultdict(lambda: [0, 0, 0])
+        self._lock = threading.Lock()
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('STATS_ENABLED', True)
+        self.interval = app.config.get('STATS_FLUSH_INTERVAL', self.interval)
+        atexit.register(self.flush)
+
+    def record(self, listing_id, views=0, impressions=0, bids=0):
+        if not self.enabled:
+            return
+        day = datetime.utcnow().date()
+        with self._lock:
+            counts = self._pending[(listing_id, day)]
+            counts[0] += views
+            counts[1] += impressions
+            counts[2] += bids
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        # Started lazily and per process: threads don't survive a pre-fork server's fork()
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='stats-flusher', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.error(f"Stats flush failed: {e}")
+
+    def flush(self):
+        """Write pending counts to the rollup tables; returns the number of listing-days written"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0, 0])
+        if not pending:
+            return 0
+        try:
+            with self.app.app_context(), sqlite_writer.transaction():
+                self._write(pending)
+        except Exception:
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for key, counts in pending.items():
+                    merged = self._pending[key]
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+            raise
+        return len(pending)
+
+    def _write(self, pending):
+        sellers = _seller_ids({listing_id for listing_id, _ in pending})
+        listing_rows = []
+        seller_totals = defaultdict(lambda: [0, 0, 0])
+        for (listing_id, day), counts in pending.items():
+            seller_id = sellers.get(listing_id)
+            if seller_id is None:
+                continue  # listing deleted meanwhile
+            listing_rows.append({'listing_id': listing_id, 'day': day, 'seller_id': seller_id,
+                                 **dict(zip(COUNTERS, counts))})
+            totals = seller_totals[(seller_id, day)]
+            for i, value in enumerate(counts):
+                totals[i] += value
+        seller_rows = [{'seller_id': seller_id, 'day': day, **dict(zip(COUNTERS, counts))}
+                       for (seller_id, day), counts in seller_totals.items()]
+        if listing_rows:
+            _upsert(ListingDailyStats, listing_rows, ['listing_id', 'day'])
+            _upsert(SellerDailyStats, seller_rows, ['seller_id', 'day'])
+        db.session.commit()
+
+
+def _conversion(views, bids):
+    return round(bids / views, 4) if views else None
+
+
+def seller_stats(seller_id, days=30, top=10):
+    """Daily series, totals and best listings for the last `days` days, read from the rollups"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = [
+        {'day': row.day.isoformat(), 'views': row.views, 'impressions': row.impressions,
+         'bids': row.bids, 'conversion': _conversion(row.views, row.bids)}
+        for row in db.session.execute(
+            select(SellerDailyStats.day, SellerDailyStats.views, SellerDailyStats.impressions, SellerDailyStats.bids)
+            .where(SellerDailyStats.seller_id == seller_id, SellerDailyStats.day >= since)
+            .order_by(SellerDailyStats.day)
+        )
+    ]
+    totals = {name: sum(day[name] for day in daily) for name in COUNTERS}
+    totals['conversion'] = _conversion(totals['views'], totals['bids'])
+
+    views = func.sum(ListingDailyStats.views).label('views')
+    bids = func.sum(ListingDailyStats.bids).label('bids')
+    listings = [
+        {'listing_id': row.listing_id, 'views': row.views, 'bids': row.bids,
+         'conversion': _conversion(row.views, row.bids)}
+        for row in db.session.execute(
+            select(ListingDailyStats.listing_id, views, bids)
+            .where(ListingDailyStats.seller_id == seller_id, ListingDailyStats.day >= since)
+            .group_by(ListingDailyStats.listing_id)
+            .order_by(views.desc())
+            .limit(top)
+        )
+    ]
+    return {'days': days, 'since': since.isoformat(), 'totals': totals, 'daily': daily, 'listings': listings}
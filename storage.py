@@ -0,0 +1,243 @@
+import os
+import secrets
+import shutil
+import tempfile
+from flask import url_for
+from itsdangerous import URLSafeTimedSerializer, BadData
+from werkzeug.utils import secure_filename
+from app import app
+
+
+# Read once at import (os.umask can only be queried by setting it); stored files get the
+# same 0644-minus-umask mode a plain open() would give, so a web server running as
+# another user (X-Accel-Redirect) can read them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o644 & ~_UMASK
+
+
+class StorageError(Exception):
+    pass
+
+
+def _serializer(purpose):
+    return URLSafeTimedSerializer(app.secret_key, salt=f"photo-upload-{purpose}")
+
+
+def sign_upload(purpose, payload):
+    """Sign an upload payload (presign ticket or local PUT grant)"""
+    return _serializer(purpose).dumps(payload)
+
+
+def load_upload(purpose, token, max_age):
+    """Return the signed payload, or None if the token is invalid or expired"""
+    try:
+        return _serializer(purpose).loads(token, max_age=max_age)
+    except BadData:
+        return None
+
+
+def new_photo_key(filename):
+    """Random, collision-free storage key that keeps a readable original name"""
+    name = secure_filename(filename or '') or 'photo.jpg'
+    return f"{secrets.token_hex(8)}_{name}"
+
+
+class LocalStorage:
+    """Photos on the local filesystem (UPLOAD_FOLDER).
+
+    Served by the UPLOAD_URL_PREFIX (/uploads/<key>) route, which hands the transfer to the web
+    server (X-Accel-Redirect / X-Sendfile) when configured. Direct uploads go to
+    a signed PUT endpoint that streams the body to disk.
+    """
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise StorageError(f"Invalid key: {key}")
+        return path
+
+    def save(self, key, data, content_type=None, overwrite=True):
+        """Write bytes or a file-like object atomically. With overwrite=False an
+        existing key is left alone and FileExistsError is raised."""
+        path = self.path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if isinstance(data, (bytes, bytearray)):
+                    f.write(data)
+                else:
+                    shutil.copyfileobj(data, f, 256 * 1024)
+            # mkstemp creates 0600 files
+            os.chmod(tmp_path, FILE_MODE)
+            if overwrite:
+                os.replace(tmp_path, path)
+            else:
+                # link() fails if the target exists, so two writers can't both win
+                os.link(tmp_path, path)
+                os.unlink(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def read(self, key, length=None):
+        """Stored bytes, or only the first `length` of them"""
+        with open(self.path(key), 'rb') as f:
+            return f.read(length if length is not None else -1)
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self.path(key))
+        except OSError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_keys(self):
+        """Yield (key, mtime) for every stored file, streaming the directory tree"""
+        stack = [self.root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and entry.name != '.gitkeep':
+                        key = os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                        yield key, entry.stat().st_mtime
+
+    def url(self, key):
+        return f"{app.config['UPLOAD_URL_PREFIX']}/{key}"
+
+    def presign_upload(self, key, content_type, max_bytes, expires_in):
+        token = sign_upload('local-put', {'key': key, 'type': content_type, 'max': max_bytes})
+        return {
+            'method': 'PUT',
+            'url': url_for('direct_upload_put', token=token),
+            'headers': {'Content-Type': content_type},
+        }
+
+
+class S3Storage:
+    """Photos in an S3-compatible bucket (AWS S3, MinIO, R2, ...).
+
+    Requires boto3. Clients upload with a presigned POST; photo URLs point at
+    S3_PUBLIC_URL (bucket website/CDN) or at presigned GETs when it's unset.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket, endpoint_url=None, region=None, public_url=None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise StorageError('STORAGE_BACKEND=s3 requires the boto3 package') from e
+        self.bucket = bucket
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def save(self, key, data, content_type=None, overwrite=True):
+        """Upload bytes or a file-like object. With overwrite=False the put is conditional
+        (If-None-Match: *) and FileExistsError is raised if the key already exists."""
+        from botocore.exceptions import ClientError
+        extra = {'ContentType': content_type} if content_type else {}
+        if overwrite and not isinstance(data, (bytes, bytearray)):
+            self.client.upload_fileobj(data, self.bucket, key, ExtraArgs=extra or None)
+            return
+        if not overwrite:
+            extra['IfNoneMatch'] = '*'
+        body = bytes(data) if isinstance(data, (bytes, bytearray)) else data
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=body, **extra)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise FileExistsError(key) from e
+            raise
+
+    def read(self, key, length=None):
+        """Stored bytes, or only the first `length` of them (a ranged GET)"""
+        extra = {'Range': f"bytes=0-{length - 1}"} if length else {}
+        return self.client.get_object(Bucket=self.bucket, Key=key, **extra)['Body'].read()
+
+    def _head(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError:
+            return None
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def size(self, key):
+        head = self._head(key)
+        return head['ContentLength'] if head else None
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_keys(self):
+        """Yield (key, mtime) for every object in the bucket, one listing page at a time"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket):
+            for obj in page.get('Contents', ()):
+                yield obj['Key'], obj['LastModified'].timestamp()
+
+    def url(self, key):
+        if self.public_url:
+            return f"{self.public_url}/{key}"
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=3600
+        )
+
+    def presign_upload(self, key, content_type, max_bytes, expires_in):
+        post = self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+
+_storage = None
+
+
+def get_storage():
+    """Configured storage backend (STORAGE_BACKEND=local|s3), created once per process"""
+    global _storage
+    if _storage is None:
+        backend = app.config['STORAGE_BACKEND']
+        if backend == 's3':
+            _storage = S3Storage(
+                bucket=app.config['S3_BUCKET'],
+                endpoint_url=app.config['S3_ENDPOINT_URL'],
+                region=app.config['S3_REGION'],
+                public_url=app.config['S3_PUBLIC_URL'],
+            )
+        elif backend == 'local':
+            _storage = LocalStorage(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']))
+        else:
+            raise StorageError(f"Unknown STORAGE_BACKEND: {backend}")
+    return _storage
+
+
+def photo_url(key):
+    return get_storage().url(key)
@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app configures its database at import time: point it at a throwaway file first
+_TMP = tempfile.mkdtemp(prefix='auction-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ.setdefault('STATS_ENABLED', '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from app import app as flask_app
+    import routes
+    import storage
+    from resumable import ResumableUploadStore
+
+    # Photos and staged uploads go to the test's temp dir
+    monkeypatch.setitem(flask_app.config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(storage, '_storage', None)
+    monkeypatch.setattr(routes, 'upload_store', ResumableUploadStore(
+        str(tmp_path / 'staging'),
+        max_size=flask_app.config['DIRECT_UPLOAD_MAX_BYTES'],
+        max_chunk_size=flask_app.config['RESUMABLE_MAX_CHUNK_SIZE']
+    ))
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+@pytest.fixture
+def seller(app):
+    from app import db
+    from models import Listing, ListingStatus, SaleMode, User
+
+    with app.app_context():
+        user = User(telegram_id=int.from_bytes(os.urandom(4), 'big'))
+        db.session.add(user)
+        db.session.commit()
+        listing = Listing(title='Camera', sale_mode=SaleMode.FREE, status=ListingStatus.DRAFT, seller_id=user.id)
+        db.session.add(listing)
+        db.session.commit()
+        return user.id, listing.id
+
+
+@pytest.fixture
+def client(app, seller):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = seller[0]
+    return client
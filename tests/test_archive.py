@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def foreign_keys(app):
+    """Enforce foreign keys on every SQLite connection, as Postgres always does"""
+    from app import db
+
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+        event.listen(db.engine, 'connect', on_connect)
+        yield
+        db.session.remove()
+        event.remove(db.engine, 'connect', on_connect)
+        db.engine.dispose()
+
+
+def _finished_listing(seller_id, bidder_id, bids):
+    from app import db
+    from models import Bid, Claim, ClaimStatus, Listing, ListingPhoto, ListingStatus, SaleMode
+
+    ended = datetime.utcnow() - timedelta(days=100)
+    listing = Listing(title='Old lamp', sale_mode=SaleMode.AUCTION, status=ListingStatus.ENDED,
+                      seller_id=seller_id, created_at=ended, end_time=ended, current_price_minor=100 * bids)
+    db.session.add(listing)
+    db.session.flush()
+    db.session.add(ListingPhoto(listing_id=listing.id, filename='lamp.jpg', order=0))
+    db.session.add_all(Bid(listing_id=listing.id, bidder_id=bidder_id, amount_minor=100 * (i + 1))
+                       for i in range(bids))
+    db.session.add(Claim(listing_id=listing.id, user_id=bidder_id, status=ClaimStatus.COMPLETED))
+    db.session.commit()
+    return listing.id
+
+
+def test_archive_with_foreign_keys_keeps_bids_photos_and_claims(app, seller, foreign_keys):
+    from app import db
+    from archive import archive_listings
+    from models import (ArchivedBid, ArchivedClaim, ArchivedListing, ArchivedListingPhoto, Bid, Claim,
+                        Listing, User)
+
+    seller_id, _ = seller
+    bidder = User(telegram_id=424242)
+    db.session.add(bidder)
+    db.session.commit()
+    listing_id = _finished_listing(seller_id, bidder.id, bids=7)
+
+    assert archive_listings([listing_id], bid_batch_size=3) == 7
+
+    assert db.session.get(Listing, listing_id) is None
+    assert db.session.query(Bid).filter_by(listing_id=listing_id).count() == 0
+    assert db.session.query(Claim).filter_by(listing_id=listing_id).count() == 0
+    archived = db.session.get(ArchivedListing, listing_id)
+    assert archived.title == 'Old lamp' and archived.current_price_minor == 700
+    assert db.session.query(ArchivedBid).filter_by(listing_id=listing_id).count() == 7
+    assert db.session.query(ArchivedListingPhoto).filter_by(listing_id=listing_id).count() == 1
+    claim = db.session.query(ArchivedClaim).filter_by(listing_id=listing_id).one()
+    assert claim.user_id == bidder.id
+
+
+def test_interrupted_archive_is_resumed(app, seller, foreign_keys, monkeypatch):
+    import archive
+    from app import db
+    from models import ArchivedBid, ArchivedListing, Bid, Listing, User
+
+    seller_id, _ = seller
+    bidder = User(telegram_id=434343)
+    db.session.add(bidder)
+    db.session.commit()
+    listing_id = _finished_listing(seller_id, bidder.id, bids=4)
+
+    def interrupted(listing_ids, bid_batch_size, pause):
+        raise KeyboardInterrupt
+
+    real_move_bids = archive._move_bids
+    monkeypatch.setattr(archive, '_move_bids', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        archive.archive_listings([listing_id])
+    # Half-moved: both rows exist, readers combining the tables skip the archived one
+    assert db.session.get(Listing, listing_id) is not None
+    assert db.session.query(ArchivedListing).filter(
+        ArchivedListing.id == listing_id, archive.fully_archived()
+    ).count() == 0
+
+    # The seller edits it before the next run; the archived copy follows
+    db.session.get(Listing, listing_id).title = 'Old lamp, repaired'
+    db.session.commit()
+    monkeypatch.setattr(archive, '_move_bids', real_move_bids)
+    assert archive.archive_listings([listing_id]) == 4
+
+    assert db.session.get(Listing, listing_id) is None
+    assert db.session.get(ArchivedListing, listing_id).title == 'Old lamp, repaired'
+    assert db.session.query(ArchivedBid).filter_by(listing_id=listing_id).count() == 4
+    assert db.session.query(Bid).filter_by(listing_id=listing_id).count() == 0
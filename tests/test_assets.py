@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.fixture
+def dist(app, tmp_path, monkeypatch):
+    import routes
+
+    for name, body in (('app.1234.js', b'plain'), ('app.1234.js.br', b'brotli'), ('app.1234.js.gz', b'gzip')):
+        (tmp_path / name).write_bytes(body)
+    monkeypatch.setattr(routes, 'dist_path', lambda app: str(tmp_path))
+    return app.test_client()
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('br, gzip', 'br'),
+    ('gzip', 'gzip'),
+    ('br; q=0, gzip', 'gzip'),
+    ('br;q=0.0, gzip', 'gzip'),
+    ('*;q=0, identity', None),
+    ('', None),
+])
+def test_serve_asset_honours_refused_encodings(dist, accept, encoding):
+    response = dist.get('/assets/app.1234.js', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == encoding
+    assert response.data == {'br': b'brotli', 'gzip': b'gzip', None: b'plain'}[encoding]
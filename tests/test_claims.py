@@ -0,0 +1,118 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+
+@pytest.fixture
+def queue_listing(app, seller):
+    """An active free listing that takes claims, inside an app context"""
+    from app import db
+    from models import Listing, ListingStatus
+
+    with app.app_context():
+        listing = db.session.get(Listing, seller[1])
+        listing.status = ListingStatus.ACTIVE
+        listing.allow_queue = True
+        db.session.commit()
+        yield listing
+
+
+def _users(count):
+    from app import db
+    from models import User
+
+    users = [User(telegram_id=int.from_bytes(os.urandom(4), 'big')) for _ in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def _statuses(listing_id, user_ids):
+    from claims import claim_status, get_claim
+    return [(claim_status(get_claim(listing_id, user_id))['status'],
+             claim_status(get_claim(listing_id, user_id))['ahead']) for user_id in user_ids]
+
+
+def test_first_claimant_holds_and_the_rest_queue_in_order(queue_listing):
+    from claims import claim_listing, queue_length
+
+    users = _users(3)
+    for user_id in users:
+        claim_listing(queue_listing, user_id)
+    # Claiming again is idempotent
+    claim_listing(queue_listing, users[1])
+
+    assert _statuses(queue_listing.id, users) == [('holding', 0), ('waiting', 1), ('waiting', 2)]
+    assert queue_length(queue_listing.id) == 3
+
+
+def test_release_promotes_next_in_line(queue_listing):
+    from claims import ClaimError, claim_listing, release_claim
+
+    users = _users(3)
+    for user_id in users:
+        claim_listing(queue_listing, user_id)
+
+    release_claim(queue_listing.id, users[0])
+    assert _statuses(queue_listing.id, users) == [('released', 0), ('holding', 0), ('waiting', 1)]
+    # A waiting claimant leaving doesn't touch the holder
+    release_claim(queue_listing.id, users[2])
+    assert _statuses(queue_listing.id, users)[1:] == [('holding', 0), ('released', 0)]
+    with pytest.raises(ClaimError):
+        release_claim(queue_listing.id, users[2])
+
+
+def test_lapsed_hold_expires_and_promotes_next(queue_listing):
+    from app import db
+    from claims import claim_listing, expire_lapsed_hold, get_claim
+
+    users = _users(2)
+    for user_id in users:
+        claim_listing(queue_listing, user_id)
+    holder = get_claim(queue_listing.id, users[0])
+
+    expire_lapsed_hold(queue_listing.id)
+    assert _statuses(queue_listing.id, users) == [('holding', 0), ('waiting', 1)]
+
+    expire_lapsed_hold(queue_listing.id, now=holder.expires_at + timedelta(seconds=1))
+    db.session.expire_all()
+    assert _statuses(queue_listing.id, users) == [('expired', 0), ('holding', 0)]
+    assert get_claim(queue_listing.id, users[1]).expires_at > datetime.utcnow()
+
+
+def test_second_holder_is_rejected_by_the_index_and_handled(queue_listing):
+    from app import db
+    from claims import _commit_promotion, claim_listing, get_claim
+    from models import Claim, ClaimStatus
+
+    users = _users(2)
+    for user_id in users:
+        claim_listing(queue_listing, user_id)
+    waiting = get_claim(queue_listing.id, users[1])
+
+    # A promotion that lost the race (it checked for a holder before the other one committed)
+    make_holder = (update(Claim).where(Claim.id == waiting.id)
+                   .values(status=ClaimStatus.HOLDING).execution_options(synchronize_session=False))
+    with pytest.raises(IntegrityError):
+        db.session.execute(make_holder)
+    db.session.rollback()
+
+    _commit_promotion(make_holder)
+    db.session.expire_all()
+    assert _statuses(queue_listing.id, users) == [('holding', 0), ('waiting', 1)]
+
+
+def test_complete_sells_to_holder_and_releases_the_queue(queue_listing):
+    from claims import claim_listing, complete_claim
+    from models import ListingStatus
+
+    users = _users(3)
+    for user_id in users:
+        claim_listing(queue_listing, user_id)
+
+    assert complete_claim(queue_listing).user_id == users[0]
+    assert queue_listing.status == ListingStatus.SOLD and queue_listing.winner_id == users[0]
+    assert [status for status, _ in _statuses(queue_listing.id, users)] == ['completed', 'released', 'released']
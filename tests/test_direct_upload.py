@@ -0,0 +1,56 @@
+import io
+
+import pytest
+from PIL import Image
+
+
+def _jpeg(size=(600, 400)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 60).convert('RGB').save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def direct_upload(client, listing_id, body):
+    """Presign, PUT the bytes to the local grant URL, then /complete; returns the /complete response"""
+    response = client.post(f'/api/listings/{listing_id}/photos/presign',
+                           json={'filename': 'photo.jpg', 'content_type': 'image/jpeg', 'size': len(body)})
+    assert response.status_code == 200
+    presign = response.get_json()
+    put = client.put(presign['upload']['url'], data=body, headers=presign['upload']['headers'])
+    assert put.status_code == 204
+    return client.post(f'/api/listings/{listing_id}/photos/complete', json={'upload_id': presign['upload_id']})
+
+
+def test_complete_reads_only_the_image_header(app, client, seller, monkeypatch):
+    from storage import LocalStorage
+    from utils import IMAGE_HEADER_BYTES
+
+    body = _jpeg((1600, 1200))
+    assert len(body) > IMAGE_HEADER_BYTES
+    reads = []
+    real_read = LocalStorage.read
+    monkeypatch.setattr(LocalStorage, 'read',
+                        lambda self, key, length=None: reads.append(length) or real_read(self, key, length))
+
+    response = direct_upload(client, seller[1], body)
+    assert response.status_code == 200
+    assert reads == [IMAGE_HEADER_BYTES]
+
+
+def test_complete_rejects_and_deletes_non_images(app, client, seller):
+    from storage import get_storage
+
+    response = direct_upload(client, seller[1], b'<html>not an image</html>' * 100)
+    assert response.status_code == 400
+    with app.app_context():
+        assert not any(get_storage().iter_keys())
+
+
+@pytest.mark.parametrize('fmt', ['PNG', 'GIF', 'WEBP'])
+def test_image_header_formats(app, fmt):
+    from utils import is_image_header
+
+    buffer = io.BytesIO()
+    Image.effect_noise((800, 600), 60).convert('RGB').save(buffer, fmt)
+    assert is_image_header(buffer.getvalue()[:4096])
+    assert not is_image_header(b'RIFF\0\0\0\0WAVEfmt ')
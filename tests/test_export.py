@@ -0,0 +1,18 @@
+import gzip
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize('accept, gzipped', [
+    ('gzip', True),
+    ('gzip;q=0, identity', False),
+    ('identity', False),
+])
+def test_export_gzip_follows_accept_encoding(client, seller, accept, gzipped):
+    response = client.get('/api/export?format=ndjson', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert (response.headers.get('Content-Encoding') == 'gzip') == gzipped
+    body = gzip.decompress(response.data) if gzipped else response.data
+    records = [json.loads(line) for line in body.decode().splitlines()]
+    assert [record['listing_id'] for record in records if record['type'] == 'listing'] == [seller[1]]
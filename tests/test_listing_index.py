@@ -0,0 +1,28 @@
+from listing_index import IndexedListing, ListingSearchIndex
+from models import SaleMode
+
+
+def _listing(title):
+    return IndexedListing(title, SaleMode.FIXED_PRICE, 1000, None)
+
+
+def test_retitled_listing_does_not_match_old_title():
+    index = ListingSearchIndex()
+    index.upsert(1, _listing('Red sofa'))
+    index.upsert(1, _listing('Blue lamp'))
+    assert index.search('so') == ([], False)
+    assert index.search('bl') == ([1], False)
+
+
+def test_listing_readded_after_removal_does_not_match_old_title():
+    index = ListingSearchIndex()
+    index.upsert(1, _listing('Red sofa'))
+    index.upsert(2, _listing('Sofa bed'))
+    index.remove(1)
+    # Closed, then reopened under a new title
+    index.upsert(1, _listing('Blue lamp'))
+    assert index.search('so') == ([2], False)
+    assert index.search('re') == ([], False)
+    assert index.search('bl') == ([1], False)
+    index.rebuild()
+    assert index.search('so') == ([2], False)
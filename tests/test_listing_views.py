@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def views(app, monkeypatch):
+    import routes
+
+    recorded = []
+    monkeypatch.setattr(routes.stats_counter, 'record',
+                        lambda listing_id, **counts: recorded.append((listing_id, counts)))
+    return recorded
+
+
+@pytest.fixture
+def visitor(app):
+    from app import db
+    from models import User
+
+    with app.app_context():
+        user = User(telegram_id=int.from_bytes(os.urandom(4), 'big'))
+        db.session.add(user)
+        db.session.commit()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+        return client
+
+
+def test_detail_fetch_by_visitor_counts_a_view(app, seller, visitor, views):
+    _, listing_id = seller
+    assert visitor.get(f'/api/listings/{listing_id}').status_code == 200
+    assert visitor.get(f'/api/listings/{listing_id}?fields=id,description').status_code == 200
+    assert views == [(listing_id, {'views': 1})] * 2
+
+
+def test_countdown_polls_and_seller_fetches_are_not_views(app, seller, client, visitor, views):
+    _, listing_id = seller
+    assert visitor.get(f'/api/listings/{listing_id}?fields=countdown').status_code == 200
+    assert client.get(f'/api/listings/{listing_id}').status_code == 200
+    assert client.get(f'/api/listings/{listing_id}?fields=description').status_code == 200
+    assert views == []
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('12.5', 1250), (12, 1200), (' 3 ', 300), ('1000000000', 100_000_000_000),
+    ('1e40', None), ('1e27', None), (10 ** 30, None), ('1000000000.01', None),
+    ('-1', None), ('nan', None), ('inf', None), ('', None), ('abc', None), (True, None),
+])
+def test_to_minor_units(app, value, expected):
+    from utils import to_minor_units
+    assert to_minor_units(value) == expected
+
+
+@pytest.mark.parametrize('query', ['price_min=1e40', 'price_max=1e27', 'limit=0', 'limit=-5'])
+def test_search_rejects_nothing_with_a_500(client, query):
+    response = client.get(f'/api/listings?{query}')
+    assert response.status_code == 200
@@ -0,0 +1,49 @@
+import json
+import os
+from urllib.parse import quote
+
+import pytest
+
+
+@pytest.fixture
+def limiter(app, monkeypatch):
+    import routes
+    from ratelimit import MemoryBuckets
+
+    monkeypatch.setattr(routes.limiter, 'enabled', True)
+    monkeypatch.setattr(routes.limiter, 'backend', MemoryBuckets())
+    return routes.limiter
+
+
+def _init_data(telegram_id):
+    return 'user=' + quote(json.dumps({'id': telegram_id, 'first_name': 'Bidder'}))
+
+
+def test_header_users_behind_one_proxy_get_their_own_buckets(app, seller, limiter):
+    _, listing_id = seller
+    base = int.from_bytes(os.urandom(3), 'big') << 8
+    statuses = []
+    for i in range(12):
+        # No session cookie: each user signs in with the Telegram header only
+        response = app.test_client().post(
+            f'/api/listings/{listing_id}/bid', json={'amount': 10},
+            headers={'X-Telegram-Init-Data': _init_data(base + i)},
+            environ_base={'REMOTE_ADDR': '10.0.0.1'}
+        )
+        statuses.append(response.status_code)
+    assert 429 not in statuses
+
+
+def test_rejected_request_refunds_earlier_buckets(app, limiter):
+    from ratelimit import Limit
+
+    user, tight = Limit('user', burst=2, rate=0.001), Limit('ip', burst=1, rate=0.001)
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.2'}):
+        from flask import session
+        session['user_id'] = 1
+        assert limiter.check('probe', (user, tight)) == 0
+        # The ip bucket is empty: rejected, and the user token it took is given back
+        assert limiter.check('probe', (user, tight)) > 0
+        assert limiter.check('probe', (user, tight)) > 0
+        assert limiter.check('probe', (user,)) == 0
+        assert limiter.check('probe', (user,)) > 0
@@ -0,0 +1,102 @@
+import io
+
+import pytest
+from PIL import Image
+
+import resumable
+
+CHUNK = 2048
+
+
+@pytest.fixture
+def photo_bytes():
+    # Smooth and EXIF-free, so image processing stores it byte for byte
+    buffer = io.BytesIO()
+    Image.linear_gradient('L').resize((600, 400)).convert('RGB').save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def small_copy_buffer(monkeypatch):
+    # Lets a short chunk body be partially written, like a dropped connection mid-chunk
+    monkeypatch.setattr(resumable, 'COPY_BUFFER', 512)
+
+
+def start_upload(client, listing_id, size):
+    response = client.post(f'/api/listings/{listing_id}/uploads',
+                           json={'filename': 'photo.jpg', 'content_type': 'image/jpeg', 'size': size})
+    assert response.status_code == 200
+    return response.get_json()['upload_id']
+
+
+def put_chunk(client, upload_id, data, start, total, body=None):
+    """PUT data[start:start+len] announcing the full chunk; `body` sends fewer bytes (interruption)"""
+    body = data if body is None else body
+    end = start + len(data) - 1
+    return client.put(f'/api/uploads/{upload_id}', input_stream=io.BytesIO(body), content_type='image/jpeg',
+                      headers={'Content-Range': f'bytes {start}-{end}/{total}', 'Content-Length': str(len(data))})
+
+
+def test_interrupted_chunk_resumes_and_completes(app, client, seller, photo_bytes):
+    size = len(photo_bytes)
+    assert size > 3 * CHUNK
+    upload_id = start_upload(client, seller[1], size)
+
+    assert put_chunk(client, upload_id, photo_bytes[:CHUNK], 0, size).status_code == 200
+
+    # Connection drops after 1500 bytes of the second chunk's bytes
+    chunk = photo_bytes[CHUNK:2 * CHUNK]
+    response = put_chunk(client, upload_id, chunk, CHUNK, size, body=chunk[:1500])
+    assert response.status_code == 400
+    status = response.get_json()
+    assert status['offset'] == CHUNK + 1500
+    assert status['ranges'] == [[0, CHUNK + 1500]]
+    assert status['complete'] is False
+
+    # The client reconnects, asks where to continue and sends the rest
+    status = client.get(f'/api/uploads/{upload_id}').get_json()
+    assert status['offset'] == CHUNK + 1500
+    offset = status['offset']
+    while offset < size:
+        response = put_chunk(client, upload_id, photo_bytes[offset:offset + CHUNK], offset, size)
+        assert response.status_code == 200
+        offset += CHUNK
+    status = response.get_json()
+    assert status['complete'] is True
+    assert status['ranges'] == [[0, size]]
+
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    assert response.status_code == 200
+    key = response.get_json()['photos'][0]['filename']
+    with app.app_context():
+        from storage import get_storage
+        assert get_storage().read(key) == photo_bytes
+
+
+def test_out_of_order_and_retried_chunks(client, seller, photo_bytes):
+    size = len(photo_bytes)
+    upload_id = start_upload(client, seller[1], size)
+    starts = list(range(0, size, CHUNK))
+
+    for start in reversed(starts[1:]):
+        put_chunk(client, upload_id, photo_bytes[start:start + CHUNK], start, size)
+    status = client.get(f'/api/uploads/{upload_id}').get_json()
+    # Nothing contiguous from the start yet, but every later byte is accounted for
+    assert status['offset'] == 0
+    assert status['received'] == size - CHUNK
+
+    put_chunk(client, upload_id, photo_bytes[:CHUNK], 0, size)
+    status = put_chunk(client, upload_id, photo_bytes[:CHUNK], 0, size).get_json()  # retry is harmless
+    assert status['complete'] is True
+    assert status['offset'] == size
+
+
+def test_content_range_total_must_match_declared_size(client, seller, photo_bytes):
+    size = len(photo_bytes)
+    upload_id = start_upload(client, seller[1], size)
+
+    response = put_chunk(client, upload_id, photo_bytes[:CHUNK], 0, size + 1)
+    assert response.status_code == 400
+    assert response.get_json()['received'] == 0
+
+    assert put_chunk(client, upload_id, photo_bytes[:CHUNK], 0, '*').status_code == 200
@@ -0,0 +1,112 @@
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import select, union
+from sqlalchemy.orm import selectinload
+from app import db
+from models import Listing, ListingPhoto, ListingStatus, ArchivedListingPhoto
+from ratelimit import MemoryBuckets
+from sqlite_profile import sqlite_writer
+
+
+class DeletePacer:
+    """Caps deletions per second so the GC doesn't compete with live uploads for I/O"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._buckets = MemoryBuckets()
+
+    def wait(self):
+        if self.rate <= 0:
+            return
+        while True:
+            delay = self._buckets.take('gc-delete', max(1, self.rate), self.rate)
+            if not delay:
+                return
+            time.sleep(delay)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def referenced_keys(keys):
+    """Subset of `keys` used by a hot or archived listing photo"""
+    rows = db.session.execute(union(
+        select(ListingPhoto.filename).where(ListingPhoto.filename.in_(keys)),
+        select(ArchivedListingPhoto.filename).where(ArchivedListingPhoto.filename.in_(keys)),
+    )).scalars()
+    return set(rows)
+
+
+def iter_orphaned_keys(storage, grace_seconds, batch_size=1000):
+    """Stream stored keys older than the grace period that no photo row references.
+    Memory use is bounded by batch_size regardless of how many files exist.
+    """
+    cutoff = time.time() - grace_seconds
+    candidates = (key for key, mtime in storage.iter_keys() if mtime < cutoff)
+    for batch in _batches(candidates, batch_size):
+        used = referenced_keys(batch)
+        # Release the read transaction between batches
+        db.session.rollback()
+        for key in batch:
+            if key not in used:
+                yield key
+
+
+def collect_orphaned_uploads(storage, grace_seconds, pacer, dry_run=False, batch_size=1000, log=None):
+    """Delete (or just count, with dry_run) unreferenced files; returns how many"""
+    removed = 0
+    for key in iter_orphaned_keys(storage, grace_seconds, batch_size):
+        if dry_run:
+            if log:
+                log(f"[dry-run] orphan {key}")
+        else:
+            pacer.wait()
+            storage.delete(key)
+        removed += 1
+    return removed
+
+
+def purge_abandoned_drafts(storage, max_age_days, pacer, dry_run=False, batch_size=100, log=None):
+    """Delete DRAFT listings created more than max_age_days ago, with their photo files.
+    Returns (listings, files) removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    listings = files = 0
+    last_id = 0
+    while True:
+        with sqlite_writer.transaction():
+            drafts = Listing.query.filter(
+                Listing.status == ListingStatus.DRAFT,
+                Listing.created_at < cutoff,
+                Listing.id > last_id
+            ).options(
+                selectinload(Listing.photos), selectinload(Listing.bids)
+            ).order_by(Listing.id).limit(batch_size).all()
+            if not drafts:
+                db.session.rollback()
+                break
+            last_id = drafts[-1].id
+
+            keys = [photo.filename for draft in drafts for photo in draft.photos]
+            if dry_run:
+                if log:
+                    for draft in drafts:
+                        log(f"[dry-run] draft {draft.id} ({len(draft.photos)} photos)")
+                db.session.rollback()
+            else:
+                for draft in drafts:
+                    db.session.delete(draft)
+                db.session.commit()
+        if not dry_run:
+            # Files go only after the rows are gone, so no listing ever points at a missing file;
+            # a crash in between just leaves orphans for the next collect_orphaned_uploads()
+            for key in keys:
+                pacer.wait()
+                storage.delete(key)
+        listings += len(drafts)
+        files += len(keys)
+    return listings, files
@@ -1,12 +1,13 @@
+import io
 import os
-import secrets
 import hashlib
 import hmac
 import json
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from urllib.parse import unquote
 from PIL import Image
-from werkzeug.utils import secure_filename
 from app import app
+from storage import get_storage, new_photo_key
 
 def verify_telegram_webapp_data(init_data, bot_token):
     """
@@ -76,20 +77,62 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_uploaded_image(file, max_width=1280, max_height=1280):
-    """Process and resize uploaded image"""
+# Enough of a file to reach the dimensions of any JPEG (EXIF/ICC segments come first)
+IMAGE_HEADER_BYTES = 128 * 1024
+
+def is_image_header(data):
+    """True if `data`, the first IMAGE_HEADER_BYTES of a file (or all of it), starts an
+    image in one of the allowed formats. Only headers are parsed, so callers can check
+    a stored object with a ranged read instead of downloading it."""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        # Pillow wants the whole file for WebP; the first chunk is VP8, VP8L or VP8X
+        return data[12:15] == b'VP8'
+    try:
+        image = Image.open(io.BytesIO(data))
+        return image.format in ('JPEG', 'PNG', 'GIF') and image.width > 0 and image.height > 0
+    except Exception:
+        return False
+
+def is_already_optimized(image, byte_size, max_width, max_height):
+    """True if an upload can be stored without re-encoding: a JPEG/WebP within the
+    target size, without EXIF (which may carry GPS data) and already well compressed.
+    Photos downscaled by the WebApp before upload match this.
+    """
+    return (
+        image.format in ('JPEG', 'WEBP')
+        and image.mode in ('RGB', 'L')
+        and image.width <= max_width
+        and image.height <= max_height
+        and 'exif' not in image.info
+        and byte_size <= image.width * image.height * app.config['PHOTO_PASSTHROUGH_MAX_BPP']
+    )
+
+def process_uploaded_image(file, max_width=None, max_height=None):
+    """Process and resize uploaded image, then store it in the configured storage backend.
+    Returns the storage key (saved as ListingPhoto.filename)."""
     if not file or not allowed_file(file.filename):
         return None
     
+    max_width = max_width or app.config['PHOTO_MAX_DIMENSION']
+    max_height = max_height or app.config['PHOTO_MAX_DIMENSION']
+    
     try:
-        # Generate secure filename
-        filename = secure_filename(file.filename)
-        name, ext = os.path.splitext(filename)
-        secure_name = f"{secrets.token_hex(8)}_{name}{ext}"
+        key = new_photo_key(file.filename)
+        ext = os.path.splitext(key)[1].lower()
+        image_format = Image.registered_extensions().get(ext, 'JPEG')
         
-        # Open and process image
+        # Open image (reads the header only; pixels are decoded lazily)
         image = Image.open(file.stream)
         
+        # Already downscaled and compressed by the client: store the bytes untouched
+        file.stream.seek(0, os.SEEK_END)
+        byte_size = file.stream.tell()
+        if is_already_optimized(image, byte_size, max_width, max_height):
+            key = os.path.splitext(key)[0] + ('.webp' if image.format == 'WEBP' else '.jpg')
+            file.stream.seek(0)
+            get_storage().save(key, file.stream, Image.MIME[image.format])
+            return key
+        
         # Convert to RGB if needed
         if image.mode in ('RGBA', 'P'):
             image = image.convert('RGB')
@@ -99,20 +142,54 @@ def process_uploaded_image(file, max_width=1280, max_height=1280):
             image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
         
         # Save processed image
-        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_name)
-        full_path = os.path.join(app.root_path, upload_path)
-        image.save(full_path, optimize=True, quality=85)
+        output = io.BytesIO()
+        image.save(output, format=image_format, optimize=True, quality=app.config['PHOTO_QUALITY'])
+        output.seek(0)
+        get_storage().save(key, output, Image.MIME.get(image_format))
         
-        return secure_name
+        return key
     except Exception as e:
         app.logger.error(f"Error processing image: {e}")
         return None
 
-def format_price(amount):
-    """Format price for display"""
-    if amount is None:
+# Largest accepted price (₪1,000,000,000); well inside the BigInteger price columns
+MAX_PRICE_MINOR = 100_000_000_000
+
+def to_minor_units(value):
+    """Parse a user-supplied price (e.g. "12.5", 12, 12.50) into integer minor units.
+    Returns None for empty, invalid, negative or out-of-range (above MAX_PRICE_MINOR) input.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        amount_minor = value * 100
+    else:
+        try:
+            amount = Decimal(str(value).strip())
+            if not amount.is_finite():
+                return None
+            amount_minor = int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+        except (InvalidOperation, ValueError):
+            return None
+    return amount_minor if 0 <= amount_minor <= MAX_PRICE_MINOR else None
+
+def minor_to_major(amount_minor):
+    """Convert integer minor units to a JSON-friendly major-unit number"""
+    if amount_minor is None:
+        return None
+    if amount_minor % 100 == 0:
+        return amount_minor // 100
+    return amount_minor / 100
+
+def format_price(amount_minor):
+    """Format price (integer minor units) for display"""
+    if amount_minor is None:
         return "Free"
-    return f"₪{int(float(amount))}"
+    return f"₪{amount_minor // 100}"
+
+def format_price_exact(amount_minor):
+    """Format price (integer minor units) including agorot"""
+    return f"₪{amount_minor // 100}.{amount_minor % 100:02d}"
 
 def calculate_time_remaining(end_time):
     """Calculate time remaining for auction"""